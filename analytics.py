@@ -0,0 +1,214 @@
+import threading
+from collections import deque
+from datetime import date, timedelta
+from functools import lru_cache
+from itertools import accumulate, repeat
+
+import archive
+from db_config import get_connection
+
+# Completion statistics over a habit's full history.
+#
+# A habit's goal-met days are held as one Python int used as a bitset, with
+# bit i set when the goal was met i days before today. Streaks, weekday and
+# period counts are shifts, masks and popcounts over that int rather than
+# loops over dates, and every habit shares the same masks because bit 0 is
+# always today.
+
+STATS_BATCH_SIZE = 500
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+_ONE = ord("1")
+_TO_DIGITS = bytes.maketrans(b"01", b"\x00\x01")
+
+
+def _bitset(offsets, length):
+    # Mark the offsets in a "0"/"1" byte string and parse it as base 2 (most significant bit first)
+    chars = bytearray(b"0" * length)
+    deque(map(chars.__setitem__, offsets, repeat(_ONE)), maxlen=0)
+    chars.reverse()
+    return int(chars, 2)
+
+
+@lru_cache(maxsize=32)
+def _every_seventh(length):
+    # Bits 0, 7, 14, ... below length
+    return int("0000001" * (length // 7 + 1), 2)
+
+
+def _mask(width):
+    return (1 << width) - 1
+
+
+class HabitStats:
+    """Statistics for one habit as of `today`."""
+
+    __slots__ = ("habit_id", "today", "age", "bits")
+
+    def __init__(self, habit_id, today, first_day, bits):
+        self.habit_id = habit_id
+        self.today = today
+        # Days tracked, today included
+        self.age = max((today - first_day).days + 1, 1)
+        self.bits = bits
+
+    # --- Totals and streaks ---
+    @property
+    def completed_days(self):
+        return self.bits.bit_count()
+
+    @property
+    def completion_rate(self):
+        return self.completed_days / self.age
+
+    @property
+    def longest_streak(self):
+        if not self.bits:
+            return 0
+        return max(map(len, bin(self.bits)[2:].split("0")))
+
+    @property
+    def current_streak(self):
+        # Like Habit.get_streak(): a run ending yesterday still counts today
+        bits = self.bits if self.bits & 1 else self.bits >> 1
+        return (~bits & (bits + 1)).bit_length() - 1
+
+    # --- Windows (offsets are days before today, inclusive) ---
+    def count(self, newest, oldest):
+        return ((self.bits >> newest) & _mask(oldest - newest + 1)).bit_count()
+
+    def active_days(self, newest, oldest):
+        return max(min(oldest, self.age - 1) - newest + 1, 0)
+
+    def rate(self, newest, oldest):
+        active = self.active_days(newest, oldest)
+        return self.count(newest, oldest) / active if active else None
+
+    def weekdays(self):
+        # [(completed, active days)] for Monday..Sunday over the whole history
+        base = _every_seventh(self.age)
+        result = []
+        for weekday in range(7):
+            # Bit i falls on this weekday when i = phase (mod 7)
+            phase = (self.today.weekday() - weekday) % 7
+            completed = (self.bits & (base << phase)).bit_count()
+            active = (self.age - 1 - phase) // 7 + 1 if self.age > phase else 0
+            result.append((completed, active))
+        return result
+
+    def periods(self, kind):
+        # [(first day, completed, active days)] per "week" (Monday first) or "month", newest first
+        result = []
+        end = self.today
+        while True:
+            if kind == "week":
+                start = end - timedelta(days=end.weekday())
+            else:
+                start = end.replace(day=1)
+            newest, oldest = (self.today - end).days, (self.today - start).days
+            result.append((start, self.count(newest, oldest), self.active_days(newest, oldest)))
+
+            if oldest >= self.age - 1:
+                return result
+            end = start - timedelta(days=1)
+
+    def rolling(self, window, days=30):
+        # Completion rate over the `window` days ending on each of the last `days` days, oldest first
+        length = self.age + window
+        digits = format(self.bits, "b").zfill(length)[::-1].encode().translate(_TO_DIGITS)
+        prefix = [0, *accumulate(digits[:days + window])]
+        # Days before the habit existed don't count against it
+        series = [(prefix[i + window] - prefix[i]) / min(window, self.age - i) for i in range(min(days, self.age))]
+        series.reverse()
+        return series
+
+
+# --- Cache ---
+_cache = {}
+_lock = threading.Lock()
+_generation = 0
+
+
+def invalidate(habit_id=None):
+    # Drop cached stats after a write; no habit_id drops everything
+    global _generation
+    with _lock:
+        _generation += 1
+        if habit_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(habit_id, None)
+
+
+def get_stats(habit):
+    return get_many([habit])[habit.habit_id]
+
+
+def get_many(habits):
+    today = date.today()
+    with _lock:
+        found = {h.habit_id: _cache[h.habit_id] for h in habits
+                 if h.habit_id in _cache and _cache[h.habit_id].today == today}
+        generation = _generation
+
+    missing = [h for h in habits if h.habit_id not in found]
+    if missing:
+        computed = _compute(missing, today)
+        with _lock:
+            # Only cache if no write landed while we were reading
+            if generation == _generation:
+                _cache.update(computed)
+        found.update(computed)
+    return found
+
+
+class _DaysAgo(dict):
+    # "YYYY-MM-DD" -> days before today, parsed once per distinct date
+    def __init__(self, today):
+        super().__init__()
+        self.today = today
+
+    def __missing__(self, day):
+        offset = self[day] = (self.today - date.fromisoformat(day)).days
+        return offset
+
+
+def _compute(habits, today):
+    # One row per habit with its goal-met days concatenated, so the per-day work
+    # is string splitting and dict lookups in C rather than one fetched row per day
+    days_ago = _DaysAgo(today)
+    offsets = {}
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        ids = [h.habit_id for h in habits]
+        for i in range(0, len(ids), STATS_BATCH_SIZE):
+            chunk = ids[i:i + STATS_BATCH_SIZE]
+            cursor.execute(
+                "SELECT habit_id, GROUP_CONCAT(log_date) FROM habit_logs WHERE completed = 1 AND log_date <= %s "
+                f"AND habit_id IN ({', '.join(['%s'] * len(chunk))}) GROUP BY habit_id",
+                (today,) + tuple(chunk)
+            )
+            for habit_id, days in cursor.fetchall():
+                offsets[habit_id] = list(map(days_ago.__getitem__, days.split(",")))
+        # Compacted years are already bitmaps: re-based and OR-ed in whole
+        archived = archive.load_bits(cursor, ids)
+        cursor.close()
+
+    stats = {}
+    for habit in habits:
+        days = offsets.get(habit.habit_id, ())
+        years = archived.get(habit.habit_id, {})
+        first_day = habit.created_at
+        if days:
+            first_day = min(first_day, today - timedelta(days=max(days)))
+        if years:
+            oldest = min(years)
+            first_day = min(first_day, archive.first_day(oldest, years[oldest]))
+        age = max((today - first_day).days + 1, 1)
+
+        bits = _bitset(days, age)
+        for year, year_bits in years.items():
+            bits |= archive.days_ago_bits(year, year_bits, today)
+        stats[habit.habit_id] = HabitStats(habit.habit_id, today, first_day, bits)
+    return stats
\ No newline at end of file
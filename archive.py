@@ -0,0 +1,194 @@
+import os
+from datetime import date, timedelta
+from functools import lru_cache
+from itertools import compress
+
+from db_config import get_connection
+
+# Compacted history.
+#
+# Days older than the archive horizon are folded out of habit_logs into
+# habit_log_archive: one row per habit and year whose `days` column is a
+# 46-byte little-endian bitmap, bit j set when the goal was met on day j of
+# the year (0 = 1 January). A year of history becomes one small row instead
+# of up to 366. Only the goal-met flag is kept: partial completions on
+# archived days are dropped. Readers combine the bitmaps with the habit_logs
+# rows that remain.
+
+# Days newer than this are never archived, so recent history, today's writes
+# and the outbox's late replays only ever touch habit_logs
+MIN_HORIZON_DAYS = 60
+DEFAULT_HORIZON_DAYS = 365
+# Set to have the app compact in the background, keeping this many days as rows
+ARCHIVE_DAYS = os.environ.get("HABIT_GARDEN_ARCHIVE_DAYS")
+
+YEAR_BYTES = 46
+COMPACT_BATCH = 100
+ARCHIVE_BATCH_SIZE = 500
+
+_TO_FLAGS = bytes.maketrans(b"01", b"\x00\x01")
+
+
+def live_since():
+    # The oldest day that can't be in the archive
+    return date.today() - timedelta(days=MIN_HORIZON_DAYS)
+
+
+# --- Bitmaps ---
+def to_blob(bits):
+    return bits.to_bytes(YEAR_BYTES, "little")
+
+
+def from_blob(blob):
+    return int.from_bytes(blob, "little")
+
+
+def day_bit(day):
+    return 1 << (day.timetuple().tm_yday - 1)
+
+
+@lru_cache(maxsize=16)
+def _year_dates(year):
+    first = date(year, 1, 1)
+    return tuple(first + timedelta(days=i) for i in range((date(year + 1, 1, 1) - first).days))
+
+
+def unpack(year, bits, start=None, end=None):
+    # The dates set in one year's bitmap, oldest first, optionally limited to start..end
+    dates = _year_dates(year)
+    lo = max((start - dates[0]).days, 0) if start is not None else 0
+    hi = min((end - dates[0]).days + 1, len(dates)) if end is not None else len(dates)
+    if lo >= hi:
+        return []
+    # One 0/1 byte per day, least significant bit (1 January) first
+    flags = format(bits, f"0{len(dates)}b")[::-1].encode().translate(_TO_FLAGS)
+    return list(compress(dates[lo:hi], flags[lo:hi]))
+
+
+def first_day(year, bits):
+    return date(year, 1, 1) + timedelta(days=(bits & -bits).bit_length() - 1)
+
+
+def days_ago_bits(year, bits, today):
+    # Re-base a year's bitmap so bit i means i days before today (as in analytics)
+    length = (date(year + 1, 1, 1) - date(year, 1, 1)).days
+    reversed_bits = int(format(bits, f"0{length}b")[::-1], 2)
+    shift = (today - date(year, 12, 31)).days
+    return reversed_bits << shift if shift >= 0 else reversed_bits >> -shift
+
+
+# --- Reading ---
+def load_bits(cursor, habit_ids=None, first_year=None, last_year=None):
+    # {habit_id: {year: bits}}; no habit_ids reads every habit
+    query = "SELECT habit_id, year, days FROM habit_log_archive WHERE 1=1"
+    params = ()
+    if first_year is not None:
+        query += " AND year BETWEEN %s AND %s"
+        params = (first_year, last_year)
+
+    result = {}
+    chunks = [None]
+    if habit_ids is not None:
+        ids = list(habit_ids)
+        chunks = [ids[i:i + ARCHIVE_BATCH_SIZE] for i in range(0, len(ids), ARCHIVE_BATCH_SIZE)]
+
+    for chunk in chunks:
+        if chunk is None:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(f"{query} AND habit_id IN ({', '.join(['%s'] * len(chunk))})", params + tuple(chunk))
+        for habit_id, year, days in cursor.fetchall():
+            result.setdefault(habit_id, {})[year] = from_blob(days)
+    return result
+
+
+def load_days(cursor, habit_ids=None, start=None, end=None):
+    # {habit_id: [archived goal-met dates, oldest first]}
+    years = (start.year, end.year) if start is not None else (None, None)
+    return {habit_id: [day for year in sorted(by_year) for day in unpack(year, by_year[year], start, end)]
+            for habit_id, by_year in load_bits(cursor, habit_ids, *years).items()}
+
+
+def is_archived(cursor, habit_id, day):
+    cursor.execute("SELECT days FROM habit_log_archive WHERE habit_id=%s AND year=%s", (habit_id, day.year))
+    row = cursor.fetchone()
+    return bool(row and from_blob(row[0]) & day_bit(day))
+
+
+def drop_archived(cursor, entries, archived):
+    # The (habit_id, log_date) entries whose day isn't already archived as met.
+    # archived caches {habit_id: {year: bits}} across calls for the same import.
+    cutoff = live_since()
+    missing = {habit_id for habit_id, day in entries if day < cutoff and habit_id not in archived}
+    if missing:
+        loaded = load_bits(cursor, missing)
+        for habit_id in missing:
+            archived[habit_id] = loaded.get(habit_id, {})
+    return [(habit_id, day) for habit_id, day in entries
+            if day >= cutoff or not archived[habit_id].get(day.year, 0) & day_bit(day)]
+
+
+# --- Compaction ---
+def _compact_batch(cursor, habit_ids, cutoff, stats):
+    cursor.execute(
+        "SELECT log_id, habit_id, log_date, completed FROM habit_logs "
+        f"WHERE habit_id IN ({', '.join(['%s'] * len(habit_ids))}) AND log_date < %s",
+        tuple(habit_ids) + (cutoff,)
+    )
+    rows = cursor.fetchall()
+    if not rows:
+        return
+
+    folded = {}
+    for _, habit_id, log_date, completed in rows:
+        if completed:
+            key = (habit_id, log_date.year)
+            folded[key] = folded.get(key, 0) | day_bit(log_date)
+
+    existing = load_bits(cursor, {habit_id for habit_id, _ in folded})
+    updates, inserts = [], []
+    for (habit_id, year), bits in folded.items():
+        if year in existing.get(habit_id, {}):
+            updates.append((to_blob(bits | existing[habit_id][year]), habit_id, year))
+        else:
+            inserts.append((habit_id, year, to_blob(bits)))
+    cursor.executemany("UPDATE habit_log_archive SET days=%s WHERE habit_id=%s AND year=%s", updates)
+    cursor.executemany("INSERT INTO habit_log_archive (habit_id, year, days) VALUES (%s, %s, %s)", inserts)
+
+    # Delete exactly the rows that were read, so a write landing meanwhile is never lost
+    log_ids = [row[0] for row in rows]
+    for i in range(0, len(log_ids), ARCHIVE_BATCH_SIZE):
+        chunk = log_ids[i:i + ARCHIVE_BATCH_SIZE]
+        cursor.execute(f"DELETE FROM habit_logs WHERE log_id IN ({', '.join(['%s'] * len(chunk))})", tuple(chunk))
+
+    stats["rows"] += len(rows)
+    stats["days"] += sum(bits.bit_count() for bits in folded.values())
+
+
+def compact(horizon_days=DEFAULT_HORIZON_DAYS, batch_size=COMPACT_BATCH, progress=None, cancel=None):
+    # Fold habit_logs rows older than horizon_days into the archive, one
+    # transaction per batch of habits. progress(habits done) runs after each;
+    # setting the cancel event stops before the next one.
+    cutoff = date.today() - timedelta(days=max(horizon_days, MIN_HORIZON_DAYS))
+    stats = {"habits": 0, "rows": 0, "days": 0}
+    last_id = 0
+
+    while cancel is None or not cancel.is_set():
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT habit_id FROM habits WHERE habit_id > %s ORDER BY habit_id LIMIT %s",
+                           (last_id, batch_size))
+            habit_ids = [row[0] for row in cursor.fetchall()]
+            if not habit_ids:
+                cursor.close()
+                return stats
+
+            _compact_batch(cursor, habit_ids, cutoff, stats)
+            conn.commit()
+            cursor.close()
+
+        last_id = habit_ids[-1]
+        stats["habits"] += len(habit_ids)
+        if progress:
+            progress(stats["habits"])
+    return stats
@@ -0,0 +1,165 @@
+import sqlite3
+from datetime import date
+
+# Storage engines behind get_connection(). Each backend knows how to open a
+# connection and supplies the few SQL fragments where MySQL and SQLite differ;
+# everything else in the models is shared SQL with %s placeholders.
+
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()))
+
+
+SCHEMA_LOCK = "habit_garden_schema"
+
+
+class MySQLBackend:
+    name = "mysql"
+    insert_ignore = "INSERT IGNORE"
+    # Each DDL statement commits on its own
+    transactional_ddl = False
+
+    def __init__(self, config):
+        self.config = config
+
+    def connect(self):
+        import mysql.connector
+        conn = mysql.connector.connect(**self.config)
+        # The default 1 KB GROUP_CONCAT limit would truncate a habit's history
+        cursor = conn.cursor()
+        cursor.execute("SET SESSION group_concat_max_len = 16777216")
+        cursor.close()
+        return conn
+
+    def drop_temp_table(self, table):
+        # DROP TEMPORARY never commits implicitly, unlike a plain DROP TABLE
+        return f"DROP TEMPORARY TABLE IF EXISTS {table}"
+
+    def table_exists(self, cursor, table):
+        cursor.execute("SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() "
+                       "AND TABLE_NAME = %s", (table,))
+        return cursor.fetchone()[0] > 0
+
+    def lock_schema(self, cursor, timeout):
+        # A named lock held by this session; it survives the commits DDL makes
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (SCHEMA_LOCK, timeout))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("Timed out waiting for another client to finish upgrading the schema")
+
+    def unlock_schema(self, cursor):
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (SCHEMA_LOCK,))
+        cursor.fetchone()
+
+
+class SQLiteBackend:
+    name = "sqlite"
+    insert_ignore = "INSERT OR IGNORE"
+    transactional_ddl = True
+
+    def __init__(self, path, busy_timeout=10):
+        self.path = path
+        self.busy_timeout = busy_timeout
+
+    def connect(self):
+        return SQLiteConnection(self.path, self.busy_timeout)
+
+    def drop_temp_table(self, table):
+        return f"DROP TABLE IF EXISTS temp.{table}"
+
+    def table_exists(self, cursor, table):
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = %s", (table,))
+        return cursor.fetchone()[0] > 0
+
+    def lock_schema(self, cursor, timeout):
+        # The write lock, held until the upgrade commits; the busy timeout covers the wait
+        cursor.execute("BEGIN IMMEDIATE")
+
+    def unlock_schema(self, cursor):
+        pass
+
+
+def _dict_row(cursor, row):
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+
+class SQLiteCursor:
+    """Accepts the MySQL-style %s placeholders used throughout the models."""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        if dictionary:
+            self._cursor.row_factory = _dict_row
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(sql.replace("%s", "?"), params)
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(sql.replace("%s", "?"), seq_of_params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Minimal mysql.connector look-alike over an embedded SQLite file."""
+
+    def __init__(self, path, busy_timeout=10):
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, detect_types=sqlite3.PARSE_DECLTYPES,
+                                     check_same_thread=False)
+        # WAL lets the UI keep reading while a background write commits
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    def cursor(self, dictionary=False):
+        return SQLiteCursor(self._conn.cursor(), dictionary=dictionary)
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def is_connected(self):
+        try:
+            self._conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+def create_backend(name, mysql_config, sqlite_path):
+    if name == "mysql":
+        return MySQLBackend(mysql_config)
+    if name == "sqlite":
+        return SQLiteBackend(sqlite_path)
+    raise ValueError(f"Unknown database backend: {name!r} (expected 'mysql' or 'sqlite')")
@@ -0,0 +1,285 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import analytics
+import db_config
+import migrations
+from instrumentation import get_metrics
+from models import Habit
+from progression import get_progression
+
+# Benchmarks for the model and UI refresh hot paths.
+#
+#   python bench.py                          # small + medium datasets
+#   python bench.py --datasets large --json run.json
+#   python bench.py --compare baseline.json  # show change against an earlier run
+#
+# Each dataset is seeded once (deterministically) into an SQLite file in
+# --data-dir and copied before every run, so write benchmarks start clean.
+
+DATASETS = {
+    "small": 10,
+    "medium": 1000,
+    "large": 50000,
+}
+
+DEFAULT_DATASETS = ["small", "medium"]
+MAX_YEARS = 5
+SEED = 1234
+
+
+def dataset_path(data_dir, habits, years):
+    return os.path.join(data_dir, f"bench_{habits}h_{years}y_seed{SEED}.db")
+
+
+def seed_dataset(path, habits, years):
+    if os.path.exists(path):
+        return
+
+    print(f"Seeding {habits} habits with up to {years} years of history -> {path}")
+    db_config.configure("sqlite", path + ".tmp")
+    migrations.upgrade()
+
+    rng = random.Random(SEED)
+    today = date.today()
+    max_days = years * 365
+
+    with db_config.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO habits (name, daily_goal, created_at) VALUES (%s, %s, %s)",
+            [(f"Habit {i:05d}", rng.randint(1, 3), today - timedelta(days=rng.randint(0, max_days)))
+             for i in range(habits)]
+        )
+        cursor.execute("SELECT habit_id, created_at, daily_goal FROM habits")
+        rows = cursor.fetchall()
+
+        xp = []
+        for habit_id, created_at, daily_goal in rows:
+            density = rng.uniform(0.3, 0.95)
+            days = (today - created_at).days
+            logs = [(habit_id, today - timedelta(days=k), daily_goal) for k in range(days + 1) if rng.random() < density]
+            cursor.executemany("INSERT INTO habit_logs (habit_id, log_date, completed, completions) "
+                               "VALUES (%s, %s, 1, %s)", logs)
+            xp.append((len(logs) * get_progression().xp_for_completion(daily_goal), habit_id))
+
+        cursor.executemany("UPDATE habits SET xp=%s WHERE habit_id=%s", xp)
+        conn.commit()
+        cursor.close()
+
+    Habit.rebuild_stats()
+    db_config.configure()
+    os.replace(path + ".tmp", path)
+
+
+def summarize(samples, queries):
+    samples = sorted(samples)
+    p95 = statistics.quantiles(samples, n=20)[18] if len(samples) > 1 else samples[0]
+    return {
+        "runs": len(samples),
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "queries": statistics.median(queries),
+    }
+
+
+def measure(fn, repeat, setup=None):
+    metrics = get_metrics()
+    samples = []
+    queries = []
+    for i in range(repeat):
+        args = setup(i) if setup else ()
+        before = metrics.total_queries
+        started = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - started)
+        queries.append(metrics.total_queries - before)
+    return summarize(samples, queries)
+
+
+def model_cases(repeat):
+    habits = Habit.get_all()
+    rng = random.Random(SEED)
+    picks = [rng.choice(habits) for _ in range(repeat)]
+    today = date.today()
+
+    def uncached(i):
+        analytics.invalidate()
+        return (habits,)
+
+    return {
+        "Habit.get_all": measure(Habit.get_all, repeat),
+        "Habit.get_streak": measure(lambda h: h.get_streak(), repeat, lambda i: (picks[i],)),
+        "Habit.get_streaks(all)": measure(Habit.get_streaks, repeat,
+                                          lambda i: ([h.habit_id for h in habits],)),
+        "Habit.log_today": measure(lambda h: h.log_today(), min(repeat, len(habits)),
+                                   lambda i: (habits[i],)),
+        "Habit.get_history(30d)": measure(lambda h: h.get_history(today - timedelta(days=29), today),
+                                          repeat, lambda i: (picks[i],)),
+        "Habit.recent_history(all)": measure(Habit.load_recent_history, repeat,
+                                             lambda i: (Habit.get_all(),)),
+        "analytics.get_many(all)": measure(analytics.get_many, repeat, uncached),
+    }
+
+
+def _pump(root, done):
+    while not done():
+        root.update()
+        time.sleep(0.001)
+
+
+def ui_cases(repeat):
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        return {"skipped": f"no Tk display available ({e})"}
+
+    try:
+        from outbox import Outbox
+        from ui.habit_detail_window import HabitDetailWindow
+        from ui.main_window import MainWindow
+    except ImportError as e:
+        root.destroy()
+        return {"skipped": f"UI dependencies missing ({e})"}
+
+    root.withdraw()
+    results = {}
+    # A throwaway outbox: the user's own pending writes must not be replayed into the bench database
+    outbox_dir = tempfile.mkdtemp(prefix="habit_garden_bench_outbox")
+    outbox = Outbox(os.path.join(outbox_dir, "outbox.db"))
+    try:
+        window = MainWindow(root, outbox=outbox, auto_sync=False)
+        _pump(root, lambda: not window.worker.busy)
+
+        def load_habits():
+            window.load_habits()
+            _pump(root, lambda: not window.worker.busy)
+
+        results["MainWindow.load_habits"] = measure(load_habits, repeat)
+
+        rng = random.Random(SEED)
+        picks = [rng.choice(window.habits) for _ in range(repeat)]
+
+        def load_history(habit):
+            detail = HabitDetailWindow(root, habit, window.worker)
+            detail.withdraw()
+            _pump(root, lambda: not detail.page_loading and not window.worker.busy)
+            detail.destroy()
+
+        results["HabitDetailWindow.load_history"] = measure(load_history, repeat,
+                                                            lambda i: (picks[i],))
+        window.close()
+    finally:
+        try:
+            root.destroy()
+        except tk.TclError:
+            pass
+        outbox.close()
+        shutil.rmtree(outbox_dir, ignore_errors=True)
+    return results
+
+
+def run_dataset(name, habits, args):
+    source = dataset_path(args.data_dir, habits, args.years)
+    seed_dataset(source, habits, args.years)
+
+    work = os.path.join(args.data_dir, f"run_{name}.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(work + suffix):
+            os.remove(work + suffix)
+    shutil.copy(source, work)
+
+    db_config.configure("sqlite", work)
+    migrations.upgrade()
+    with db_config.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM habit_logs")
+        log_rows = cursor.fetchone()[0]
+        cursor.close()
+
+    results = model_cases(args.repeat)
+    if not args.no_ui:
+        results.update(ui_cases(args.repeat))
+
+    db_config.configure()
+    return {"habits": habits, "log_rows": log_rows, "results": results}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, baseline=None):
+    for name, dataset in report["datasets"].items():
+        print(f"\n== {name}: {dataset['habits']} habits, {dataset['log_rows']} log rows")
+        old = (baseline or {}).get("datasets", {}).get(name, {}).get("results", {})
+
+        for case, result in dataset["results"].items():
+            if case == "skipped":
+                print(f"  UI cases skipped: {result}")
+                continue
+
+            line = (f"  {case:<34} p50 {result['p50_ms']:>9.3f} ms  p95 {result['p95_ms']:>9.3f} ms  "
+                    f"queries {result['queries']:>5}")
+            if case in old and old[case]["p50_ms"]:
+                change = (result["p50_ms"] - old[case]["p50_ms"]) / old[case]["p50_ms"] * 100
+                line += f"  ({change:+.1f}% p50)"
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Habit Garden benchmarks")
+    parser.add_argument("--datasets", default=",".join(DEFAULT_DATASETS),
+                        help=f"comma-separated, from {', '.join(DATASETS)}")
+    parser.add_argument("--years", type=int, default=MAX_YEARS, help="maximum history per habit")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "habit_garden_bench"))
+    parser.add_argument("--no-ui", action="store_true", help="skip the Tk window benchmarks")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier --json output to compare against")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "years": args.years,
+        "datasets": {},
+    }
+
+    for name in args.datasets.split(","):
+        report["datasets"][name] = run_dataset(name, DATASETS[name], args)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import time
+
+from db_config import get_connection
+
+# Change log shared by every client of one database.
+#
+# Each write that touches a habit appends a habit_changes row in the same
+# transaction. A client remembers the last change_id it has seen and polls for
+# rows past it: an indexed range read capped at POLL_LIMIT rows, so a quiet
+# tick costs the same however big the garden is. A NULL habit_id means every
+# habit may have changed (e.g. after rebuild-stats).
+
+POLL_LIMIT = 200
+# A missing change_id is waited for this long before it is written off (see ChangeFeed)
+GAP_TIMEOUT = 10
+RETENTION_DAYS = 7
+
+
+def record(cursor, habit_ids):
+    now = int(time.time())
+    cursor.executemany("INSERT INTO habit_changes (habit_id, changed_at) VALUES (%s, %s)",
+                       [(habit_id, now) for habit_id in habit_ids])
+
+
+def record_all(cursor):
+    record(cursor, [None])
+
+
+def latest_version():
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(change_id), 0) FROM habit_changes")
+        version = cursor.fetchone()[0]
+        cursor.close()
+    return version
+
+
+def prune(days=RETENTION_DAYS):
+    # Clients that were away for longer than this miss those changes until their next full reload
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM habit_changes WHERE changed_at < %s", (int(time.time()) - days * 86400,))
+        removed = cursor.rowcount
+        conn.commit()
+        cursor.close()
+    return removed
+
+
+class ChangeFeed:
+    """One client's position in habit_changes.
+
+    MySQL hands out change_ids when rows are inserted, but they become visible
+    when their transaction commits, so a later id can show up before an earlier
+    one. The feed only moves its version past an id once it has seen it, or
+    once the gap is GAP_TIMEOUT seconds old (a rolled-back write never fills).
+    """
+
+    def __init__(self, version=0, limit=POLL_LIMIT):
+        self.version = version
+        self.limit = limit
+        # change_ids above version that were already delivered, and since when a missing one has held it back
+        self._seen = set()
+        self._stalled_since = None
+
+    def poll(self):
+        # Returns the habit_ids changed since the last poll, or None if everything should be reloaded
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT change_id, habit_id FROM habit_changes WHERE change_id > %s ORDER BY change_id LIMIT %s",
+                (self.version, self.limit)
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+
+        changed = set()
+        reload_all = False
+        for change_id, habit_id in rows:
+            if change_id in self._seen:
+                continue
+            self._seen.add(change_id)
+            if habit_id is None:
+                reload_all = True
+            else:
+                changed.add(habit_id)
+
+        self._advance()
+        return None if reload_all else changed
+
+    def _advance(self):
+        for change_id in sorted(self._seen):
+            if change_id != self.version + 1:
+                now = time.monotonic()
+                if self._stalled_since is None:
+                    self._stalled_since = now
+                if now - self._stalled_since < GAP_TIMEOUT:
+                    return
+            self._seen.discard(change_id)
+            self.version = change_id
+            self._stalled_since = None
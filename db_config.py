@@ -1,9 +1,176 @@
-import mysql.connector
+import os
+import queue
+import threading
+import time
+
+from backends import create_backend
+from instrumentation import InstrumentedCursor, get_metrics
+
+# --- DATABASE SETTINGS ---
+# "mysql" for a shared server, "sqlite" for an embedded single-user file.
+DB_BACKEND = os.environ.get("HABIT_GARDEN_BACKEND", "mysql")
+
+MYSQL_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "",
+    "database": "habit_garden"
+}
+
+SQLITE_PATH = os.environ.get("HABIT_GARDEN_SQLITE_PATH", "habit_garden.db")
+
+# --- POOL SETTINGS ---
+POOL_SIZE = int(os.environ.get("HABIT_GARDEN_POOL_SIZE", "5"))
+POOL_TIMEOUT = 10  # seconds to wait for a free connection
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = create_backend(DB_BACKEND, MYSQL_CONFIG, SQLITE_PATH)
+    return _backend
+
+
+class PooledConnection:
+    """A checked-out connection. close() (or leaving a with-block) hands it back to the pool."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self.backend = pool.backend
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._raw.cursor(*args, **kwargs), get_metrics())
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def close(self, broken=False):
+        if self._raw is not None:
+            self._pool.release(self._raw, broken)
+            self._raw = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        broken = False
+        if exc_type is not None and self._raw is not None:
+            try:
+                self._raw.rollback()
+            except Exception:
+                # The server dropped the connection; the original error is the one to raise
+                broken = True
+        self.close(broken)
+
+
+class ConnectionPool:
+    def __init__(self, backend, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.backend = backend
+        self._connect = backend.connect
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.checked_out = 0
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise RuntimeError(f"No database connection available after {self.timeout}s")
+
+        try:
+            raw = self._checkout_idle()
+            if raw is None:
+                started = time.perf_counter()
+                raw = self._connect()
+                get_metrics().record_connect(time.perf_counter() - started)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.checked_out += 1
+        return PooledConnection(self, raw)
+
+    def _checkout_idle(self):
+        while True:
+            try:
+                raw = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+
+            # Health check: drop connections the server has closed on us
+            if raw.is_connected():
+                return raw
+            self._discard(raw)
+
+    def release(self, raw, broken=False):
+        # A connection that can't roll back is closed, never handed out again
+        try:
+            if not broken:
+                # Never hand out a connection with an open transaction (or stale snapshot)
+                if raw.in_transaction:
+                    raw.rollback()
+                self._idle.put(raw)
+        except Exception:
+            broken = True
+        finally:
+            if broken:
+                self._discard(raw)
+            with self._lock:
+                self.checked_out -= 1
+            self._slots.release()
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        return {"size": self.size, "checked_out": self.checked_out, "idle": self._idle.qsize()}
+
+    def close_all(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(get_backend())
+    return _pool
+
+
+def configure(backend=None, sqlite_path=None):
+    # Switch databases at runtime (tools and benchmarks); idle connections are closed
+    global DB_BACKEND, SQLITE_PATH, _backend, _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        DB_BACKEND = backend or DB_BACKEND
+        SQLITE_PATH = sqlite_path or SQLITE_PATH
+        _backend = None
+        _pool = None
+
 
 def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",
-        database="habit_garden"
-    )
\ No newline at end of file
+    return get_pool().acquire()
@@ -0,0 +1,149 @@
+import csv
+import gzip
+import io
+import json
+import os
+
+from db_config import get_connection
+from models import HABIT_COLUMNS
+
+# Snapshot of every habit and its full history, one file per table:
+#   habits.csv + habit_logs.csv + habit_log_archive.csv, or .jsonl, optionally
+#   gzip-compressed (.gz). Archive bitmaps are written as hex (see archive.py).
+#
+# Rows are read in primary-key order, CHUNK_ROWS per query and FETCH_ROWS per
+# fetchmany(), and written as they arrive, so memory stays flat however long
+# the history is. After each chunk the file is synced and a checkpoint in the
+# output directory records the last key and the file size; exporting into the
+# same directory again resumes from there. habit_logs.csv can be read back by
+# importer.py.
+
+CHUNK_ROWS = 50000
+FETCH_ROWS = 5000
+FORMATS = ("csv", "jsonl")
+CHECKPOINT_FILE = "export.checkpoint.json"
+
+# (table, primary key, columns); the key comes first so a chunk's last row holds it
+TABLES = [
+    ("habits", "habit_id", HABIT_COLUMNS.split(", ")),
+    ("habit_logs", "log_id", ["log_id", "habit_id", "log_date", "completed", "completions"]),
+    ("habit_log_archive", "archive_id", ["archive_id", "habit_id", "year", "days"]),
+]
+
+
+def output_path(directory, table, fmt, compress):
+    return os.path.join(directory, f"{table}.{fmt}" + (".gz" if compress else ""))
+
+
+def _encode(fmt, columns, rows):
+    rows = [[value.hex() if isinstance(value, (bytes, bytearray)) else value for value in row] for row in rows]
+    if fmt == "csv":
+        out = io.StringIO()
+        csv.writer(out, lineterminator="\n").writerows(rows)
+        return out.getvalue().encode("utf-8")
+    # Dates become ISO strings
+    return "".join(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows).encode("utf-8")
+
+
+def _write(f, data, compress):
+    # Each compressed write is its own gzip member, so the file stays valid when cut at a checkpoint
+    if compress:
+        with gzip.GzipFile(fileobj=f, mode="wb") as member:
+            member.write(data)
+    else:
+        f.write(data)
+
+
+def _load_checkpoint(directory, fmt, compress):
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    # A checkpoint for another format can't be resumed
+    if checkpoint["format"] != fmt or checkpoint["compress"] != compress:
+        return None
+    return checkpoint
+
+
+def _save_checkpoint(directory, checkpoint):
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+
+def _new_checkpoint(fmt, compress):
+    # Rows added after the export starts are left out, so it has a fixed end
+    tables = {}
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        for table, key, _ in TABLES:
+            cursor.execute(f"SELECT COALESCE(MAX({key}), 0) FROM {table}")
+            tables[table] = {"last_key": 0, "until": cursor.fetchone()[0], "rows": 0, "offset": 0, "done": False}
+        cursor.close()
+    return {"format": fmt, "compress": compress, "tables": tables}
+
+
+def _copy_chunk(f, table, key, columns, state, fmt, compress, chunk_size):
+    # Append up to chunk_size rows after state["last_key"]; returns (rows, last key)
+    count, last_key = 0, state["last_key"]
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE {key} > %s AND {key} <= %s ORDER BY {key} LIMIT %s",
+            (state["last_key"], state["until"], chunk_size)
+        )
+        while True:
+            rows = cursor.fetchmany(FETCH_ROWS)
+            if not rows:
+                break
+            _write(f, _encode(fmt, columns, rows), compress)
+            count += len(rows)
+            last_key = rows[-1][0]
+        cursor.close()
+    return count, last_key
+
+
+def export_all(directory, fmt="csv", compress=False, chunk_size=CHUNK_ROWS, restart=False,
+               progress=None, cancel=None):
+    # progress(table, rows written, fraction done) is called after each chunk. Setting the
+    # cancel event stops at the next chunk, leaving a checkpoint to resume from. Returns
+    # ({table: rows}, finished).
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    os.makedirs(directory, exist_ok=True)
+
+    checkpoint = None if restart else _load_checkpoint(directory, fmt, compress)
+    if checkpoint is None:
+        checkpoint = _new_checkpoint(fmt, compress)
+        _save_checkpoint(directory, checkpoint)
+
+    for table, key, columns in TABLES:
+        state = checkpoint["tables"][table]
+        if state["done"]:
+            continue
+
+        with open(output_path(directory, table, fmt, compress), "r+b" if state["offset"] else "wb") as f:
+            # Drop anything written after the last checkpoint
+            f.truncate(state["offset"])
+            f.seek(state["offset"])
+            if not state["offset"] and fmt == "csv":
+                _write(f, _encode(fmt, columns, [columns]), compress)
+
+            while not state["done"]:
+                if cancel is not None and cancel.is_set():
+                    return {t: s["rows"] for t, s in checkpoint["tables"].items()}, False
+
+                count, last_key = _copy_chunk(f, table, key, columns, state, fmt, compress, chunk_size)
+                f.flush()
+                os.fsync(f.fileno())
+                state.update(last_key=last_key, rows=state["rows"] + count, offset=f.tell(),
+                             done=count < chunk_size or last_key >= state["until"])
+                _save_checkpoint(directory, checkpoint)
+
+                if progress:
+                    progress(table, state["rows"], 1.0 if state["done"] else last_key / state["until"])
+
+    os.remove(os.path.join(directory, CHECKPOINT_FILE))
+    return {table: state["rows"] for table, state in checkpoint["tables"].items()}, True
@@ -0,0 +1,145 @@
+from bisect import bisect_left, bisect_right, insort
+
+# Names are indexed by every run of this many characters
+GRAM = 3
+
+
+def _grams(text):
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+class HabitIndex:
+    """In-memory lookups over the loaded habits.
+
+    Keys are str(habit_id), matching the Treeview iids. Streaks are kept as a
+    sorted list searched with bisect and stages as sets. Name search is a
+    substring match like the paged list's SQL LIKE: lowered names are indexed
+    by trigram, so a search reads only the habits holding all of the text's
+    trigrams. Text shorter than a trigram is matched by scanning the habits
+    the other filters left.
+    """
+
+    def __init__(self, habits=()):
+        self.rebuild(habits)
+
+    def rebuild(self, habits):
+        self.by_id = {}
+        self.position = {}
+        self.order = []
+        self._names = {}
+        self._grams = {}
+        self._streaks = []
+        self._stages = {}
+        self._indexed = {}
+
+        for habit in habits:
+            key = str(habit.habit_id)
+            self.position[key] = len(self.order)
+            self.order.append(key)
+            self._add(key, habit, sort_later=True)
+
+        self._streaks.sort()
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, habit_id):
+        return str(habit_id) in self.by_id
+
+    def get(self, habit_id):
+        return self.by_id.get(str(habit_id))
+
+    def habits(self):
+        return [self.by_id[key] for key in self.order]
+
+    # --- Maintenance ---
+    def _add(self, key, habit, sort_later=False):
+        self.by_id[key] = habit
+        name = self._names[key] = habit.name.lower()
+        for gram in _grams(name):
+            self._grams.setdefault(gram, set()).add(key)
+        streak = (habit.get_streak(), key)
+        stage = habit.stage
+        # Remember what was indexed: habit objects are updated in place after writes
+        self._indexed[key] = (streak, stage)
+
+        if sort_later:
+            self._streaks.append(streak)
+        else:
+            insort(self._streaks, streak)
+
+        self._stages.setdefault(stage, set()).add(key)
+
+    @staticmethod
+    def _remove_sorted(items, entry):
+        i = bisect_left(items, entry)
+        if i < len(items) and items[i] == entry:
+            del items[i]
+
+    def _discard(self, key):
+        del self.by_id[key]
+        for gram in _grams(self._names.pop(key)):
+            keys = self._grams[gram]
+            keys.discard(key)
+            if not keys:
+                del self._grams[gram]
+        streak, stage = self._indexed.pop(key)
+        self._remove_sorted(self._streaks, streak)
+        self._stages[stage].discard(key)
+
+    def upsert(self, habit):
+        key = str(habit.habit_id)
+        if key in self.by_id:
+            self._discard(key)
+        else:
+            self.position[key] = len(self.order)
+            self.order.append(key)
+        self._add(key, habit)
+
+    def remove(self, habit_id):
+        key = str(habit_id)
+        if key not in self.by_id:
+            return
+        self._discard(key)
+        self.order.remove(key)
+        self.position = {k: i for i, k in enumerate(self.order)}
+
+    # --- Queries ---
+    def _name_matches(self, text, keys=None):
+        # "run" finds "Morning run", "Running shoes" and "Brunch prep", as LIKE '%run%' does
+        text = text.lower()
+        names = self._names
+        grams = _grams(text)
+        if grams:
+            postings = sorted((self._grams.get(gram, set()) for gram in grams), key=len)
+            candidates = postings[0] if keys is None else postings[0] & keys
+            for posting in postings[1:]:
+                if not candidates:
+                    break
+                candidates = candidates & posting
+        else:
+            candidates = names if keys is None else keys
+        # Holding every trigram isn't enough ("aaa" has all of "aaaa"'s), so confirm each match
+        return {key for key in candidates if text in names[key]}
+
+    def _streak_matches(self, min_streak, max_streak):
+        lo = bisect_left(self._streaks, (min_streak if min_streak is not None else 0,))
+        hi = len(self._streaks) if max_streak is None else bisect_right(self._streaks, (max_streak, "\uffff"))
+        return {key for _, key in self._streaks[lo:hi]}
+
+    def search(self, text="", stage=None, min_streak=None, max_streak=None):
+        candidates = None
+
+        def narrow(keys):
+            return keys if candidates is None else candidates & keys
+
+        if stage:
+            candidates = narrow(self._stages.get(stage, set()))
+        if min_streak is not None or max_streak is not None:
+            candidates = narrow(self._streak_matches(min_streak, max_streak))
+        if text.strip():
+            candidates = self._name_matches(text.strip(), candidates)
+
+        if candidates is None:
+            return self.habits()
+        return [self.by_id[key] for key in sorted(candidates, key=self.position.__getitem__)]
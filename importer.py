@@ -0,0 +1,94 @@
+import csv
+import json
+import os
+from datetime import date
+
+import changes
+from db_config import get_connection
+from models import Habit
+
+# Accepted input, one completed day per record:
+#   CSV:  header with "habit_id" or "habit" (name), "log_date", optional "completed"
+#   JSON: a list of objects or JSON Lines with the same keys
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+
+        if first == "[":
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    return "csv" if ext == ".csv" else "json"
+
+
+def _is_completed(value):
+    if value is None or value == "":
+        return True
+    if isinstance(value, str):
+        return value.strip().lower() not in ("0", "false", "no", "n")
+    return bool(value)
+
+
+class _HabitResolver:
+    # Maps habit names to ids, creating habits that don't exist yet
+    def __init__(self, conn):
+        self.conn = conn
+        cursor = conn.cursor()
+        cursor.execute("SELECT habit_id, name FROM habits")
+        self.ids = {name: habit_id for habit_id, name in cursor.fetchall()}
+        cursor.close()
+        self.created = 0
+
+    def resolve(self, record):
+        if record.get("habit_id") not in (None, ""):
+            return int(record["habit_id"])
+
+        name = str(record["habit"]).strip()
+        if name not in self.ids:
+            cursor = self.conn.cursor()
+            cursor.execute("INSERT INTO habits (name, daily_goal) VALUES (%s, %s)", (name, 1))
+            self.ids[name] = cursor.lastrowid
+            changes.record(cursor, [self.ids[name]])
+            cursor.close()
+            self.created += 1
+        return self.ids[name]
+
+
+def _entries(records, resolver, stats):
+    for record in records:
+        stats["read"] += 1
+        if not _is_completed(record.get("completed")):
+            continue
+        log_date = record["log_date"]
+        if not isinstance(log_date, date):
+            log_date = date.fromisoformat(str(log_date)[:10])
+        yield resolver.resolve(record), log_date
+
+
+def import_file(path, fmt=None, chunk_size=5000):
+    fmt = fmt or detect_format(path)
+    records = _read_csv(path) if fmt == "csv" else _read_json(path)
+    stats = {"read": 0}
+
+    with get_connection() as conn:
+        resolver = _HabitResolver(conn)
+        stats["imported"] = Habit.log_many(_entries(records, resolver, stats), chunk_size, conn)
+        stats["habits_created"] = resolver.created
+
+    return stats
@@ -0,0 +1,203 @@
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+# --- INSTRUMENTATION SETTINGS ---
+SLOW_QUERY_MS = float(os.environ.get("HABIT_GARDEN_SLOW_QUERY_MS", "100"))
+# Structured JSON-lines log of actions and slow queries; unset to disable
+METRICS_LOG_PATH = os.environ.get("HABIT_GARDEN_METRICS_LOG")
+# Print the startup timings to the console as well as logging them
+STARTUP_REPORT = os.environ.get("HABIT_GARDEN_STARTUP_REPORT") == "1"
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+SLOW_QUERY_HISTORY = 50
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(sql):
+    return _WHITESPACE.sub(" ", sql).strip()[:300]
+
+
+class Metrics:
+    """Process-wide query statistics, grouped by the user action that issued them.
+
+    Actions are tracked per thread, so work submitted to the background worker
+    is attributed to the action it runs under.
+    """
+
+    def __init__(self, slow_query_ms=SLOW_QUERY_MS, log_path=METRICS_LOG_PATH):
+        self.slow_query_ms = slow_query_ms
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.total_queries = 0
+            self.total_sql_seconds = 0.0
+            self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            self.actions = {}
+            self.slow_queries = deque(maxlen=SLOW_QUERY_HISTORY)
+            self.connections_opened = 0
+            self.connect_seconds = 0.0
+            self.connect_max_seconds = 0.0
+
+    # --- Recording ---
+    @contextmanager
+    def action(self, name):
+        outer = getattr(self._local, "action", None)
+        current = {"queries": 0, "sql_seconds": 0.0}
+        self._local.action = current
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._local.action = outer
+            self._record_action(name, current, time.perf_counter() - started)
+
+    def _record_action(self, name, current, wall_seconds):
+        with self._lock:
+            stats = self.actions.setdefault(name, {
+                "count": 0, "queries": 0, "max_queries": 0, "sql_seconds": 0.0, "wall_seconds": 0.0
+            })
+            stats["count"] += 1
+            stats["queries"] += current["queries"]
+            stats["max_queries"] = max(stats["max_queries"], current["queries"])
+            stats["sql_seconds"] += current["sql_seconds"]
+            stats["wall_seconds"] += wall_seconds
+
+        self._log({"event": "action", "name": name, "queries": current["queries"],
+                   "sql_ms": round(current["sql_seconds"] * 1000, 3),
+                   "wall_ms": round(wall_seconds * 1000, 3)})
+
+    def record_query(self, sql, seconds):
+        elapsed_ms = seconds * 1000
+        current = getattr(self._local, "action", None)
+        if current is not None:
+            current["queries"] += 1
+            current["sql_seconds"] += seconds
+
+        with self._lock:
+            self.total_queries += 1
+            self.total_sql_seconds += seconds
+            self.histogram[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+        if elapsed_ms >= self.slow_query_ms:
+            entry = {"event": "slow_query", "ms": round(elapsed_ms, 3), "sql": _normalize(sql),
+                     "at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+            with self._lock:
+                self.slow_queries.append(entry)
+            self._log(entry)
+
+    def record_connect(self, seconds):
+        with self._lock:
+            self.connections_opened += 1
+            self.connect_seconds += seconds
+            self.connect_max_seconds = max(self.connect_max_seconds, seconds)
+
+    def _log(self, entry):
+        if not self.log_path:
+            return
+        entry.setdefault("ts", time.time())
+        with self._lock:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    # --- Reading ---
+    def snapshot(self):
+        with self._lock:
+            labels = [f"<{b}ms" for b in LATENCY_BUCKETS_MS] + [f">={LATENCY_BUCKETS_MS[-1]}ms"]
+            return {
+                "total_queries": self.total_queries,
+                "total_sql_ms": round(self.total_sql_seconds * 1000, 3),
+                "histogram": dict(zip(labels, self.histogram)),
+                "actions": {name: dict(stats) for name, stats in self.actions.items()},
+                "slow_queries": list(self.slow_queries),
+                "connections_opened": self.connections_opened,
+                "connect_avg_ms": round(self.connect_seconds / self.connections_opened * 1000, 3)
+                if self.connections_opened else 0.0,
+                "connect_max_ms": round(self.connect_max_seconds * 1000, 3),
+            }
+
+
+class InstrumentedCursor:
+    def __init__(self, cursor, metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, params=()):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, params)
+        finally:
+            self._metrics.record_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_params):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, seq_of_params)
+        finally:
+            self._metrics.record_query(sql, time.perf_counter() - started)
+
+
+class StartupTimer:
+    """Milliseconds from process start to each startup milestone.
+
+    Once every milestone is reached the timings are written to the metrics log
+    as one "startup" event, so cold starts can be compared across releases.
+    """
+
+    MILESTONES = ("imports", "first_paint", "data_ready", "images_ready")
+
+    def __init__(self, metrics, report=STARTUP_REPORT):
+        self.metrics = metrics
+        self.print_report = report
+        self.started = time.perf_counter()
+        self.marks = {}
+        self.reported = False
+
+    def start(self, started):
+        # Count from an earlier perf_counter() reading, e.g. taken before the heavy imports
+        self.started = started
+
+    def mark(self, name):
+        if name in self.marks:
+            return
+        self.marks[name] = round((time.perf_counter() - self.started) * 1000, 1)
+        if not self.reported and all(m in self.marks for m in self.MILESTONES):
+            self.reported = True
+            self.report()
+
+    def report(self):
+        if self.print_report:
+            print("Startup: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.marks.items()))
+        self.metrics._log({"event": "startup", **self.marks})
+
+
+_metrics = Metrics()
+_startup = StartupTimer(_metrics)
+
+
+def get_metrics():
+    return _metrics
+
+
+def get_startup():
+    return _startup
+
+
+def action(name):
+    return _metrics.action(name)
@@ -1,6 +1,10 @@
+import time
+STARTED = time.perf_counter()
+
 import tkinter as tk
 import sys
 import ctypes
+from instrumentation import get_startup
 from ui.main_window import MainWindow
 
 # --- WINDOWS TASKBAR ICON SETUP ---
@@ -13,6 +17,13 @@ if sys.platform.startswith('win'):
         pass
 
 if __name__ == "__main__":
+    startup = get_startup()
+    startup.start(STARTED)
+    startup.mark("imports")
+
+    # MainWindow only builds widgets; the schema upgrade, habits and images follow on the worker
     root = tk.Tk()
     app = MainWindow(root)
+    root.update()
+    startup.mark("first_paint")
     root.mainloop()
\ No newline at end of file
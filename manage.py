@@ -0,0 +1,145 @@
+import argparse
+import sys
+import time
+
+import archive
+import changes
+import exporter
+import importer
+import migrations
+from models import Habit
+from outbox import get_outbox
+
+
+def cmd_upgrade(args):
+    applied = migrations.upgrade(verbose=True)
+    if not applied:
+        print(f"Schema is up to date (version {migrations.LATEST_VERSION}).")
+
+
+def cmd_schema_status(args):
+    version, pending = migrations.pending_migrations()
+    print(f"Schema version {version} (latest {migrations.LATEST_VERSION}).")
+    for number, description in pending:
+        print(f"  pending {number}: {description}")
+
+
+def cmd_rebuild_stats(args):
+    migrations.upgrade()
+    count = Habit.rebuild_stats()
+    print(f"Rebuilt streak stats for {count} habits.")
+
+
+def cmd_verify_stats(args):
+    migrations.upgrade()
+    mismatches = Habit.verify_stats()
+    for habit_id, stored, expected in mismatches:
+        print(f"Habit {habit_id}: stored {stored}, expected {expected}")
+
+    if mismatches:
+        print(f"{len(mismatches)} habits have stale stats. Run 'rebuild-stats' to fix them.")
+        return 1
+    print("All cached streak stats match habit_logs.")
+    return 0
+
+
+def cmd_import(args):
+    migrations.upgrade()
+    started = time.perf_counter()
+    stats = importer.import_file(args.path, args.format, args.chunk_size)
+    elapsed = time.perf_counter() - started
+    print(f"Read {stats['read']} records, imported {stats['imported']} new completed days "
+          f"({stats['habits_created']} habits created) in {elapsed:.1f}s.")
+
+
+def cmd_export(args):
+    migrations.upgrade()
+    started = time.perf_counter()
+
+    def progress(table, rows, fraction):
+        print(f"\r{table}: {rows} rows ({fraction:.0%})", end="", flush=True)
+
+    counts, _ = exporter.export_all(args.directory, args.format, args.gzip, args.chunk_size, args.restart, progress)
+    elapsed = time.perf_counter() - started
+    print(f"\nExported {counts['habits']} habits and {counts['habit_logs']} log rows "
+          f"to {args.directory} in {elapsed:.1f}s.")
+
+
+def cmd_sync(args):
+    migrations.upgrade()
+    outbox = get_outbox()
+    applied = 0
+    while True:
+        batch = outbox.flush()
+        if not batch:
+            break
+        applied += len(batch)
+
+    status = outbox.status()
+    print(f"Synced {applied} queued changes; {status['pending']} pending, {status['failed']} failed.")
+    return 1 if status["failed"] else 0
+
+
+def cmd_compact(args):
+    migrations.upgrade()
+    started = time.perf_counter()
+
+    def progress(habits):
+        print(f"\r{habits} habits compacted", end="", flush=True)
+
+    stats = archive.compact(args.days, progress=progress)
+    elapsed = time.perf_counter() - started
+    print(f"\nFolded {stats['rows']} log rows older than {max(args.days, archive.MIN_HORIZON_DAYS)} days "
+          f"({stats['days']} completed days) into the archive in {elapsed:.1f}s.")
+
+
+def cmd_prune_changes(args):
+    migrations.upgrade()
+    removed = changes.prune(args.days)
+    print(f"Removed {removed} change log entries older than {args.days} days.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Habit Garden maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("upgrade", help="apply pending schema migrations").set_defaults(func=cmd_upgrade)
+    commands.add_parser("schema-status", help="show the schema version and pending migrations") \
+        .set_defaults(func=cmd_schema_status)
+    commands.add_parser("rebuild-stats", help="recompute cached streaks from habit_logs") \
+        .set_defaults(func=cmd_rebuild_stats)
+    commands.add_parser("verify-stats", help="compare cached streaks against habit_logs") \
+        .set_defaults(func=cmd_verify_stats)
+
+    import_parser = commands.add_parser("import", help="bulk import completed days from CSV or JSON")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=["csv", "json"], help="default: from the file extension")
+    import_parser.add_argument("--chunk-size", type=int, default=5000)
+    import_parser.set_defaults(func=cmd_import)
+
+    export_parser = commands.add_parser("export", help="write habits and their full history to CSV or JSON Lines")
+    export_parser.add_argument("directory")
+    export_parser.add_argument("--format", choices=exporter.FORMATS, default="csv")
+    export_parser.add_argument("--gzip", action="store_true", help="compress the output files")
+    export_parser.add_argument("--chunk-size", type=int, default=exporter.CHUNK_ROWS)
+    export_parser.add_argument("--restart", action="store_true", help="ignore a checkpoint left by an earlier run")
+    export_parser.set_defaults(func=cmd_export)
+
+    commands.add_parser("sync", help="flush changes queued in the local outbox to the database") \
+        .set_defaults(func=cmd_sync)
+
+    compact_parser = commands.add_parser("compact", help="fold old habit_logs rows into per-year bitmaps")
+    compact_parser.add_argument("--days", type=int, default=archive.DEFAULT_HORIZON_DAYS,
+                                help=f"keep this many recent days as rows (at least {archive.MIN_HORIZON_DAYS})")
+    compact_parser.set_defaults(func=cmd_compact)
+
+    prune_parser = commands.add_parser("prune-changes", help="drop old entries from the habit change log")
+    prune_parser.add_argument("--days", type=int, default=changes.RETENTION_DAYS)
+    prune_parser.set_defaults(func=cmd_prune_changes)
+
+    args = parser.parse_args(argv)
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
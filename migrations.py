@@ -0,0 +1,284 @@
+from db_config import get_connection
+
+# Seconds a client waits for another one's upgrade before giving up
+LOCK_TIMEOUT = 300
+
+
+def _backfill_stats(conn):
+    # Neither habit_changes nor habit_log_archive exists yet at this version
+    from models import Habit
+    Habit._write_stats(conn, include_archive=False)
+
+
+# MySQL has no IF [NOT] EXISTS for columns and indexes, and its DDL commits as
+# it goes, so a migration that failed halfway has to be re-runnable. These
+# steps check information_schema first.
+def _column_exists(cursor, table, column):
+    cursor.execute("SELECT COUNT(*) FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() "
+                   "AND TABLE_NAME = %s AND COLUMN_NAME = %s", (table, column))
+    return cursor.fetchone()[0] > 0
+
+
+def _index_exists(cursor, table, index):
+    cursor.execute("SELECT COUNT(*) FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() "
+                   "AND TABLE_NAME = %s AND INDEX_NAME = %s", (table, index))
+    return cursor.fetchone()[0] > 0
+
+
+def _add_column(table, column, definition):
+    def step(conn):
+        cursor = conn.cursor()
+        if not _column_exists(cursor, table, column):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        cursor.close()
+    return step
+
+
+def _create_index(table, index, columns, unique=False):
+    def step(conn):
+        cursor = conn.cursor()
+        if not _index_exists(cursor, table, index):
+            cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {index} ON {table} ({columns})")
+        cursor.close()
+    return step
+
+
+def _drop_index(table, index):
+    def step(conn):
+        cursor = conn.cursor()
+        if _index_exists(cursor, table, index):
+            cursor.execute(f"DROP INDEX {index} ON {table}")
+        cursor.close()
+    return step
+
+
+# Each migration is (version, description, {dialect: [steps]}).
+# A step is either an SQL string or a callable taking the open connection.
+MIGRATIONS = [
+    (1, "base tables", {
+        "mysql": [
+            """CREATE TABLE IF NOT EXISTS habits (
+                habit_id INT AUTO_INCREMENT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                daily_goal INT NOT NULL DEFAULT 1,
+                xp INT NOT NULL DEFAULT 0,
+                created_at DATE NOT NULL DEFAULT (CURRENT_DATE)
+            )""",
+            """CREATE TABLE IF NOT EXISTS habit_logs (
+                log_id INT AUTO_INCREMENT PRIMARY KEY,
+                habit_id INT NOT NULL,
+                log_date DATE NOT NULL,
+                completed BOOLEAN NOT NULL DEFAULT FALSE
+            )""",
+        ],
+        "sqlite": [
+            """CREATE TABLE IF NOT EXISTS habits (
+                habit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                daily_goal INTEGER NOT NULL DEFAULT 1,
+                xp INTEGER NOT NULL DEFAULT 0,
+                created_at DATE NOT NULL DEFAULT CURRENT_DATE
+            )""",
+            """CREATE TABLE IF NOT EXISTS habit_logs (
+                log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                habit_id INTEGER NOT NULL,
+                log_date DATE NOT NULL,
+                completed BOOLEAN NOT NULL DEFAULT 0
+            )""",
+        ],
+    }),
+    (2, "cached streak columns on habits", {
+        "mysql": [
+            _add_column("habits", "current_streak", "INT NOT NULL DEFAULT 0"),
+            _add_column("habits", "longest_streak", "INT NOT NULL DEFAULT 0"),
+            _add_column("habits", "last_completed_date", "DATE NULL"),
+            _backfill_stats,
+        ],
+        "sqlite": [
+            "ALTER TABLE habits ADD COLUMN current_streak INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE habits ADD COLUMN longest_streak INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE habits ADD COLUMN last_completed_date DATE",
+            _backfill_stats,
+        ],
+    }),
+    (3, "habit_logs (habit_id, log_date) index", {
+        "mysql": [_create_index("habit_logs", "idx_habit_logs_habit_date", "habit_id, log_date")],
+        "sqlite": ["CREATE INDEX IF NOT EXISTS idx_habit_logs_habit_date ON habit_logs (habit_id, log_date)"],
+    }),
+    (4, "one habit_logs row per habit and day", {
+        # Keep the completed (then oldest) row of any duplicates before adding the constraint.
+        # The covering index lets streak scans and history windows read habit_logs index-only.
+        "mysql": [
+            """DELETE dup FROM habit_logs dup
+                JOIN habit_logs keep ON keep.habit_id = dup.habit_id AND keep.log_date = dup.log_date
+                AND (keep.completed > dup.completed
+                     OR (keep.completed = dup.completed AND keep.log_id < dup.log_id))""",
+            _drop_index("habit_logs", "idx_habit_logs_habit_date"),
+            _create_index("habit_logs", "uq_habit_logs_habit_date", "habit_id, log_date", unique=True),
+            _create_index("habit_logs", "idx_habit_logs_covering", "habit_id, log_date, completed"),
+        ],
+        "sqlite": [
+            """DELETE FROM habit_logs WHERE EXISTS (
+                SELECT 1 FROM habit_logs keep
+                WHERE keep.habit_id = habit_logs.habit_id AND keep.log_date = habit_logs.log_date
+                AND (keep.completed > habit_logs.completed
+                     OR (keep.completed = habit_logs.completed AND keep.log_id < habit_logs.log_id)))""",
+            "DROP INDEX IF EXISTS idx_habit_logs_habit_date",
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_habit_logs_habit_date ON habit_logs (habit_id, log_date)",
+            "CREATE INDEX IF NOT EXISTS idx_habit_logs_covering ON habit_logs (habit_id, log_date, completed)",
+        ],
+    }),
+    (5, "habits sort indexes for keyset paging", {
+        "mysql": [
+            _create_index("habits", "idx_habits_name", "name, habit_id"),
+            _create_index("habits", "idx_habits_xp", "xp, habit_id"),
+        ],
+        "sqlite": [
+            "CREATE INDEX IF NOT EXISTS idx_habits_name ON habits (name, habit_id)",
+            "CREATE INDEX IF NOT EXISTS idx_habits_xp ON habits (xp, habit_id)",
+        ],
+    }),
+    (6, "completions per day toward daily_goal", {
+        # Days already marked completed met their goal; completed stays the goal-met flag
+        "mysql": [
+            _add_column("habit_logs", "completions", "INT NOT NULL DEFAULT 0"),
+            """UPDATE habit_logs l JOIN habits h ON h.habit_id = l.habit_id
+                SET l.completions = h.daily_goal WHERE l.completed = 1""",
+            _drop_index("habit_logs", "idx_habit_logs_covering"),
+            _create_index("habit_logs", "idx_habit_logs_covering", "habit_id, log_date, completed, completions"),
+        ],
+        "sqlite": [
+            "ALTER TABLE habit_logs ADD COLUMN completions INTEGER NOT NULL DEFAULT 0",
+            """UPDATE habit_logs SET completions = COALESCE(
+                (SELECT daily_goal FROM habits WHERE habits.habit_id = habit_logs.habit_id), 1)
+                WHERE completed = 1""",
+            "DROP INDEX IF EXISTS idx_habit_logs_covering",
+            "CREATE INDEX IF NOT EXISTS idx_habit_logs_covering ON habit_logs (habit_id, log_date, completed, completions)",
+        ],
+    }),
+    (7, "outbox_applied keys for replayed client writes", {
+        # One row per outbox operation applied, written in the operation's own transaction
+        "mysql": [
+            """CREATE TABLE IF NOT EXISTS outbox_applied (
+                op_key CHAR(32) PRIMARY KEY,
+                habit_id INT NULL
+            )""",
+        ],
+        "sqlite": [
+            """CREATE TABLE IF NOT EXISTS outbox_applied (
+                op_key TEXT PRIMARY KEY,
+                habit_id INTEGER
+            )""",
+        ],
+    }),
+    (8, "habit_changes log for polling clients", {
+        # changed_at is Unix seconds, written by changes.record(); NULL habit_id means every habit
+        "mysql": [
+            """CREATE TABLE IF NOT EXISTS habit_changes (
+                change_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                habit_id INT NULL,
+                changed_at BIGINT NOT NULL
+            )""",
+        ],
+        "sqlite": [
+            """CREATE TABLE IF NOT EXISTS habit_changes (
+                change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                habit_id INTEGER,
+                changed_at INTEGER NOT NULL
+            )""",
+        ],
+    }),
+    (9, "habit_log_archive for compacted history", {
+        # One bitmap of goal-met days per habit and year; archive_id gives exports a single key
+        "mysql": [
+            """CREATE TABLE IF NOT EXISTS habit_log_archive (
+                archive_id INT AUTO_INCREMENT PRIMARY KEY,
+                habit_id INT NOT NULL,
+                year SMALLINT NOT NULL,
+                days VARBINARY(46) NOT NULL,
+                UNIQUE KEY uq_habit_log_archive (habit_id, year)
+            )""",
+        ],
+        "sqlite": [
+            """CREATE TABLE IF NOT EXISTS habit_log_archive (
+                archive_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                habit_id INTEGER NOT NULL,
+                year INTEGER NOT NULL,
+                days BLOB NOT NULL,
+                UNIQUE (habit_id, year)
+            )""",
+        ],
+    }),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _ensure_version_table(cursor):
+    cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (version INT NOT NULL)")
+
+
+def current_version(conn):
+    # Read-only, so opening an up-to-date database needs no DDL rights
+    cursor = conn.cursor()
+    version = 0
+    if conn.backend.table_exists(cursor, "schema_version"):
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        version = cursor.fetchone()[0] or 0
+    cursor.close()
+    return version
+
+
+def pending_migrations():
+    with get_connection() as conn:
+        version = current_version(conn)
+    return version, [(number, description) for number, description, _ in MIGRATIONS if number > version]
+
+
+def upgrade(verbose=False):
+    # Safe to run from every client at start: an up-to-date schema is only read,
+    # and otherwise one client upgrades under the schema lock while the rest wait.
+    # On SQLite the whole upgrade is one transaction; on MySQL each migration
+    # commits, and its steps are re-runnable if it failed halfway.
+    applied = []
+
+    with get_connection() as conn:
+        if current_version(conn) >= LATEST_VERSION:
+            return applied
+        # End the read so the version is read afresh under the lock
+        conn.rollback()
+
+        backend = conn.backend
+        cursor = conn.cursor()
+        backend.lock_schema(cursor, LOCK_TIMEOUT)
+        try:
+            _ensure_version_table(cursor)
+            # Another client may have upgraded while this one waited
+            version = current_version(conn)
+
+            for number, description, steps in MIGRATIONS:
+                if number <= version:
+                    continue
+
+                if verbose:
+                    print(f"Applying migration {number}: {description}")
+
+                for step in steps[backend.name]:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        cursor.execute(step)
+                cursor.execute("INSERT INTO schema_version (version) VALUES (%s)", (number,))
+                if not backend.transactional_ddl:
+                    conn.commit()
+                applied.append(number)
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            backend.unlock_schema(cursor)
+            cursor.close()
+
+    return applied
@@ -1,105 +1,653 @@
+import weakref
+import analytics
+import archive
+import changes
 from db_config import get_connection
 from datetime import date, timedelta
+from progression import get_progression
+
+# Column order matches Habit.__init__, so rows from HABIT_SELECT construct with Habit(*row)
+HABIT_COLUMNS = "habit_id, name, daily_goal, xp, created_at, current_streak, longest_streak, last_completed_date"
+
+# Today's completions come with each habit row (an index lookup, not an extra query); takes today's date
+TODAY_COLUMN = ("COALESCE((SELECT l.completions FROM habit_logs l "
+                "WHERE l.habit_id = habits.habit_id AND l.log_date = %s), 0)")
+HABIT_SELECT = f"SELECT {HABIT_COLUMNS}, {TODAY_COLUMN} FROM habits"
+
+# Days of history kept on each habit once recent_history is first read
+RECENT_DAYS = 30
+RECENT_BATCH_SIZE = 500
+
+# Sortable list columns; "stage" follows xp because stages only ever grow with XP.
+# The streak expression matches _live_streak(), with yesterday's date as its parameter.
+SORT_COLUMNS = {
+    "habit_id": "habit_id",
+    "name": "name",
+    "xp": "xp",
+    "stage": "xp",
+    "streak": "CASE WHEN last_completed_date >= %s THEN current_streak ELSE 0 END",
+}
+
+
+def _like_pattern(text):
+    # Substring match with LIKE wildcards in the search text taken literally
+    escaped = text.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+    return f"%{escaped}%"
+
+
+def _live_streak(current_streak, last_completed_date):
+    # A stored streak only counts while its last completion was today or yesterday
+    if last_completed_date and (date.today() - last_completed_date).days <= 1:
+        return current_streak
+    return 0
+
+
+class _Batch:
+    """The habits loaded by one query, so lazy data is fetched for all of them at once."""
+
+    __slots__ = ("members",)
+
+    def __init__(self, habits):
+        self.members = weakref.WeakValueDictionary((h.habit_id, h) for h in habits)
+
+    def habits(self):
+        return list(self.members.values())
+
 
 class Habit:
-    def __init__(self, habit_id, name, daily_goal, xp=0, created_at=None):
+    __slots__ = ("habit_id", "name", "daily_goal", "xp", "created_at",
+                 "current_streak", "longest_streak", "last_completed_date",
+                 "_today_completions", "_completions_day", "_batch", "_stage", "_recent", "__weakref__")
+
+    def __init__(self, habit_id, name, daily_goal, xp=0, created_at=None,
+                 current_streak=0, longest_streak=0, last_completed_date=None, today_completions=0):
         self.habit_id = habit_id
         self.name = name
         self.daily_goal = daily_goal
         self.xp = xp
         self.created_at = created_at if created_at else date.today()
+        self.current_streak = current_streak
+        self.longest_streak = longest_streak
+        self.last_completed_date = last_completed_date
+        self.today_completions = today_completions
+        self._batch = None
+        self._stage = None
+        self._recent = None
+
+    def __repr__(self):
+        return f"<Habit {self.habit_id} {self.name!r} xp={self.xp}>"
+
+    @staticmethod
+    def _from_rows(rows):
+        habits = [Habit(*row) for row in rows]
+        batch = _Batch(habits)
+        for habit in habits:
+            habit._batch = batch
+        return habits
+
+    # --- Derived data (lazy, cached until invalidate()) ---
+    def invalidate(self):
+        # Call after any write to this habit
+        self._stage = None
+        self._recent = None
+        analytics.invalidate(self.habit_id)
+
+    @property
+    def stage(self):
+        # Classified for the whole batch on first read
+        if self._stage is None:
+            batch = self._batch.habits() if self._batch is not None else [self]
+            Habit.load_stages([h for h in batch if h._stage is None])
+        return self._stage
+
+    @staticmethod
+    def load_stages(habits):
+        for habit, stage in zip(habits, get_progression().classify([h.xp for h in habits])):
+            habit._stage = stage
+
+    @property
+    def today_completions(self):
+        # The count belongs to the day it was loaded: a habit kept in memory past midnight has none yet today
+        return self._today_completions if self._completions_day == date.today() else 0
+
+    @today_completions.setter
+    def today_completions(self, count):
+        self._today_completions = count
+        self._completions_day = date.today()
+
+    @property
+    def goal_met_today(self):
+        return self.today_completions >= self.daily_goal
+
+    @property
+    def streak(self):
+        # Not cached: whether the stored streak is alive depends on today's date
+        return self.get_streak()
+
+    @property
+    def recent_history(self):
+        # {date: completions} for the last RECENT_DAYS days, fetched for the whole batch on first read
+        start = date.today() - timedelta(days=RECENT_DAYS - 1)
+        if self._recent is None or self._recent[0] != start:
+            batch = self._batch.habits() if self._batch is not None else [self]
+            Habit.load_recent_history(batch)
+        return self._recent[1]
+
+    @staticmethod
+    def load_recent_history(habits):
+        start = date.today() - timedelta(days=RECENT_DAYS - 1)
+        pending = {h.habit_id: h for h in habits if h._recent is None or h._recent[0] != start}
+        if not pending:
+            return
+
+        histories = {habit_id: {} for habit_id in pending}
+        ids = list(pending)
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            for i in range(0, len(ids), RECENT_BATCH_SIZE):
+                chunk = ids[i:i + RECENT_BATCH_SIZE]
+                cursor.execute(
+                    "SELECT habit_id, log_date, completions FROM habit_logs "
+                    f"WHERE habit_id IN ({', '.join(['%s'] * len(chunk))}) AND log_date >= %s",
+                    tuple(chunk) + (start,)
+                )
+                for habit_id, log_date, completions in cursor.fetchall():
+                    histories[habit_id][log_date] = completions
+            cursor.close()
+
+        for habit_id, habit in pending.items():
+            habit._recent = (start, histories[habit_id])
 
     def add_xp(self, amount):
-        self.xp += amount
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE habits SET xp=%s WHERE habit_id=%s", (self.xp, self.habit_id))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE habits SET xp = xp + %s WHERE habit_id=%s", (amount, self.habit_id))
+            changes.record(cursor, [self.habit_id])
+            cursor.execute("SELECT xp FROM habits WHERE habit_id=%s", (self.habit_id,))
+            self.xp = cursor.fetchone()[0]
+            conn.commit()
+            cursor.close()
+        self.invalidate()
 
     @staticmethod
     def get_all():
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM habits")
-        rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return [Habit(**row) for row in rows]
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"{HABIT_SELECT} ORDER BY habit_id", (date.today(),))
+            rows = cursor.fetchall()
+            cursor.close()
+        return Habit._from_rows(rows)
+
+    @staticmethod
+    def count():
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM habits")
+            total = cursor.fetchone()[0]
+            cursor.close()
+        return total
+
+    def sort_key(self, sort):
+        # Python equivalent of the SORT_COLUMNS value, used as a page boundary
+        if sort == "streak":
+            return self.get_streak()
+        if sort == "stage":
+            return self.xp
+        return getattr(self, sort)
+
+    @staticmethod
+    def _filter_conditions(filters):
+        # filters: {"name": text, "xp": (min, max), "streak": (min, max)}; bounds are
+        # inclusive and any of them may be None
+        conditions = []
+        params = ()
+        if not filters:
+            return conditions, params
+
+        if filters.get("name"):
+            conditions.append("name LIKE %s ESCAPE '!'")
+            params += (_like_pattern(filters["name"]),)
+
+        yesterday = date.today() - timedelta(days=1)
+        for key, expr, expr_params in (("xp", "xp", ()), ("streak", SORT_COLUMNS["streak"], (yesterday,))):
+            low, high = filters.get(key) or (None, None)
+            if low is not None:
+                conditions.append(f"{expr} >= %s")
+                params += expr_params + (low,)
+            if high is not None:
+                conditions.append(f"{expr} <= %s")
+                params += expr_params + (high,)
+        return conditions, params
+
+    @staticmethod
+    def get_page(sort="habit_id", descending=False, after=None, before=None, inclusive=False, limit=100,
+                 filters=None):
+        # Keyset pagination over the list ordered by (sort column, habit_id).
+        # after/before are a boundary row's (sort_key, habit_id); rows come back in list order.
+        expr = SORT_COLUMNS[sort]
+        expr_params = (date.today() - timedelta(days=1),) if "%s" in expr else ()
+
+        backwards = before is not None
+        boundary = before if backwards else after
+        flip = descending != backwards
+        value_order = "DESC" if flip else "ASC"
+        id_order = "DESC" if backwards else "ASC"
+
+        conditions, params = Habit._filter_conditions(filters)
+        if boundary is not None:
+            value_cmp = "<" if flip else ">"
+            id_cmp = ("<" if backwards else ">") + ("=" if inclusive else "")
+            conditions.append(f"({expr} {value_cmp} %s OR ({expr} = %s AND habit_id {id_cmp} %s))")
+            value, habit_id = boundary
+            params += expr_params + (value,) + expr_params + (value, habit_id)
+
+        query = HABIT_SELECT
+        params = (date.today(),) + params
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {expr} {value_order}, habit_id {id_order} LIMIT %s"
+        params += expr_params + (limit,)
+
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            cursor.close()
+
+        habits = Habit._from_rows(rows)
+        if backwards:
+            habits.reverse()
+        return habits
+
+    @staticmethod
+    def get(habit_id):
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"{HABIT_SELECT} WHERE habit_id=%s", (date.today(), habit_id))
+            row = cursor.fetchone()
+            cursor.close()
+        return Habit(*row) if row else None
 
     @staticmethod
-    def add(name, daily_goal=1):
-        conn = get_connection()
+    def get_many(habit_ids):
+        # {habit_id: Habit} for the ids that still exist
+        ids = list(habit_ids)
+        rows = []
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            for i in range(0, len(ids), RECENT_BATCH_SIZE):
+                chunk = ids[i:i + RECENT_BATCH_SIZE]
+                cursor.execute(f"{HABIT_SELECT} WHERE habit_id IN ({', '.join(['%s'] * len(chunk))})",
+                               (date.today(),) + tuple(chunk))
+                rows += cursor.fetchall()
+            cursor.close()
+        return {habit.habit_id: habit for habit in Habit._from_rows(rows)}
+
+    # add, delete and log_completions take commit=False to join a caller's
+    # transaction (the outbox records each replayed write in the same one)
+    @staticmethod
+    def add(name, daily_goal=1, conn=None, commit=True):
+        if conn is None:
+            with get_connection() as conn:
+                return Habit.add(name, daily_goal, conn)
+
         cursor = conn.cursor()
         cursor.execute("INSERT INTO habits (name, daily_goal) VALUES (%s, %s)", (name, daily_goal))
-        conn.commit()
+        habit_id = cursor.lastrowid
+        changes.record(cursor, [habit_id])
+        if commit:
+            conn.commit()
         cursor.close()
-        conn.close()
+        return habit_id
 
     @staticmethod
-    def delete(habit_id):
-        conn = get_connection()
+    def delete(habit_id, conn=None, commit=True):
+        if conn is None:
+            with get_connection() as conn:
+                return Habit.delete(habit_id, conn)
+
         cursor = conn.cursor()
         cursor.execute("DELETE FROM habit_logs WHERE habit_id=%s", (habit_id,))
+        cursor.execute("DELETE FROM habit_log_archive WHERE habit_id=%s", (habit_id,))
         cursor.execute("DELETE FROM habits WHERE habit_id=%s", (habit_id,))
-        conn.commit()
+        changes.record(cursor, [habit_id])
+        if commit:
+            conn.commit()
         cursor.close()
-        conn.close()
+        analytics.invalidate(int(habit_id))
 
     def log_today(self):
+        # One completion toward today's daily_goal, in one transaction with no
+        # client-side read-modify-write: safe when several clients share the database.
+        # XP and the streak only move when the goal is met. Returns (xp, streak),
+        # or None if today's goal was already met.
         today = date.today()
-        conn = get_connection()
-        cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM habit_logs WHERE habit_id=%s AND log_date=%s", (self.habit_id, today))
-        exists = cursor.fetchone()
+        with get_connection() as conn:
+            cursor = conn.cursor()
 
-        logged_successfully = False
+            progressed = Habit._add_completions(conn, cursor, self.habit_id, today, 1, self.daily_goal)
 
-        if not exists:
             cursor.execute(
-                "INSERT INTO habit_logs (habit_id, log_date, completed) VALUES (%s, %s, %s)",
-                (self.habit_id, today, True)
+                f"SELECT xp, current_streak, longest_streak, last_completed_date, {TODAY_COLUMN} "
+                "FROM habits WHERE habit_id=%s",
+                (today, self.habit_id)
             )
-            self.xp += 50
-            cursor.execute("UPDATE habits SET xp=%s WHERE habit_id=%s", (self.xp, self.habit_id))
-            logged_successfully = True
+            (self.xp, self.current_streak, self.longest_streak, self.last_completed_date,
+             self.today_completions) = cursor.fetchone()
 
-        conn.commit()
+            conn.commit()
+            cursor.close()
+        self.invalidate()
+
+        if not progressed:
+            return None
+        return self.xp, self.get_streak()
+
+    @staticmethod
+    def log_completions(habit_id, day, count=1, conn=None, commit=True):
+        # Replay of queued completions (see outbox.py): like log_today for any
+        # day and count. Returns False if the habit no longer exists.
+        if conn is None:
+            with get_connection() as conn:
+                return Habit.log_completions(habit_id, day, count, conn)
+
+        cursor = conn.cursor()
+        cursor.execute("SELECT daily_goal FROM habits WHERE habit_id=%s", (habit_id,))
+        row = cursor.fetchone()
+        if row is None:
+            cursor.close()
+            return False
+
+        Habit._add_completions(conn, cursor, habit_id, day, count, row[0])
+        if day != date.today():
+            # _record_completion assumes days arrive in order; rescan for late ones
+            Habit._write_stats(conn, [habit_id])
+        if commit:
+            conn.commit()
         cursor.close()
-        conn.close()
+        analytics.invalidate(habit_id)
+        return True
 
-        return logged_successfully
+    @staticmethod
+    def _add_completions(conn, cursor, habit_id, day, count, daily_goal):
+        # Add up to `count` completions on `day`, capped at daily_goal. XP and the
+        # streak move when the day reaches its goal. Returns False if already met.
+        if day < archive.live_since() and archive.is_archived(cursor, habit_id, day):
+            return False
+
+        # The (habit_id, log_date) unique key makes the insert a no-op once the row exists
+        cursor.execute(
+            f"{conn.backend.insert_ignore} INTO habit_logs (habit_id, log_date, completed, completions) "
+            "VALUES (%s, %s, 0, 0)",
+            (habit_id, day)
+        )
+        cursor.execute(
+            "UPDATE habit_logs SET completions = CASE WHEN completions + %s > %s THEN %s ELSE completions + %s END "
+            "WHERE habit_id=%s AND log_date=%s AND completions < %s",
+            (count, daily_goal, daily_goal, count, habit_id, day, daily_goal)
+        )
+        if cursor.rowcount != 1:
+            return False
+        changes.record(cursor, [habit_id])
+
+        cursor.execute(
+            "UPDATE habit_logs SET completed = 1 "
+            "WHERE habit_id=%s AND log_date=%s AND completed = 0 AND completions >= %s",
+            (habit_id, day, daily_goal)
+        )
+        if cursor.rowcount == 1:
+            Habit._record_completion(cursor, habit_id, day, get_progression().xp_for_completion(daily_goal))
+        return True
+
+    def apply_completion(self):
+        # Predict log_today's effect in memory, for writes still waiting in the
+        # outbox. The next sync replaces this with the stored row.
+        if self.goal_met_today:
+            return False
+
+        today = date.today()
+        self.today_completions += 1
+        if self.goal_met_today:
+            self.xp += get_progression().xp_for_completion(self.daily_goal)
+            if self.last_completed_date == today - timedelta(days=1):
+                self.current_streak += 1
+            elif self.last_completed_date != today:
+                self.current_streak = 1
+            self.longest_streak = max(self.longest_streak, self.current_streak)
+            self.last_completed_date = today
+        self.invalidate()
+        return True
+
+    @staticmethod
+    def log_many(entries, chunk_size=5000, conn=None):
+        # Bulk-record completed days, e.g. history imported from another tracker.
+        # entries yields (habit_id, log_date); each day counts as the habit's full
+        # daily_goal. Unknown habits and days that are already completed are skipped;
+        # a day in the future raises ValueError. Everything commits as one transaction,
+        # with XP and cached streaks recomputed once at the end.
+        if conn is None:
+            with get_connection() as conn:
+                return Habit.log_many(entries, chunk_size, conn)
+
+        drop_staging = conn.backend.drop_temp_table("import_logs")
 
-    def get_streak(self):
-        conn = get_connection()
         cursor = conn.cursor()
+        cursor.execute(drop_staging)
+        # Keyed, so the merge below probes it instead of scanning it for every habit_logs row
+        cursor.execute("CREATE TEMPORARY TABLE import_logs "
+                       "(habit_id INT NOT NULL, log_date DATE NOT NULL, PRIMARY KEY (habit_id, log_date))")
+        stage = f"{conn.backend.insert_ignore} INTO import_logs (habit_id, log_date) VALUES (%s, %s)"
+
+        # 1. Stage the raw rows in chunks, leaving out days folded into the archive (already completed)
+        today = date.today()
+        archived = {}
+        chunk = []
+        for habit_id, log_date in entries:
+            if log_date > today:
+                raise ValueError(f"Completion for habit {habit_id} on {log_date} is in the future")
+            chunk.append((habit_id, log_date))
+            if len(chunk) >= chunk_size:
+                cursor.executemany(stage, archive.drop_archived(cursor, chunk, archived))
+                chunk = []
+        if chunk:
+            cursor.executemany(stage, archive.drop_archived(cursor, chunk, archived))
+
+        # 2. Count the days that are new for each habit (for XP) before merging
         cursor.execute(
-            "SELECT log_date FROM habit_logs WHERE habit_id=%s AND completed=1 ORDER BY log_date DESC",
-            (self.habit_id,)
+            "SELECT s.habit_id, COUNT(DISTINCT s.log_date), MIN(s.log_date), h.daily_goal FROM import_logs s "
+            "JOIN habits h ON h.habit_id = s.habit_id "
+            "LEFT JOIN habit_logs l ON l.habit_id = s.habit_id AND l.log_date = s.log_date AND l.completed = 1 "
+            "WHERE l.habit_id IS NULL GROUP BY s.habit_id, h.daily_goal"
         )
-        rows = cursor.fetchall()
+        new_days = cursor.fetchall()
+
+        # 3. Merge: complete existing missed or partial rows, insert the rest
+        cursor.execute(
+            "UPDATE habit_logs SET completed = 1, "
+            "completions = (SELECT daily_goal FROM habits WHERE habits.habit_id = habit_logs.habit_id) "
+            "WHERE completed = 0 AND EXISTS ("
+            "SELECT 1 FROM import_logs s WHERE s.habit_id = habit_logs.habit_id AND s.log_date = habit_logs.log_date)"
+        )
+        cursor.execute(
+            f"{conn.backend.insert_ignore} INTO habit_logs (habit_id, log_date, completed, completions) "
+            "SELECT DISTINCT s.habit_id, s.log_date, 1, h.daily_goal FROM import_logs s "
+            "JOIN habits h ON h.habit_id = s.habit_id"
+        )
+
+        # 4. XP, creation dates and cached streaks, once per habit
+        progression = get_progression()
+        cursor.executemany(
+            "UPDATE habits SET xp = xp + %s, "
+            "created_at = CASE WHEN created_at > %s THEN %s ELSE created_at END WHERE habit_id=%s",
+            [(count * progression.xp_for_completion(goal), first, first, habit_id)
+             for habit_id, count, first, goal in new_days]
+        )
+        habit_ids = [habit_id for habit_id, _, _, _ in new_days]
+        if habit_ids:
+            Habit._write_stats(conn, habit_ids)
+            changes.record(cursor, habit_ids)
+
+        cursor.execute(drop_staging)
+        conn.commit()
         cursor.close()
-        conn.close()
+        for habit_id in habit_ids:
+            analytics.invalidate(habit_id)
 
-        if not rows:
-            return 0
+        return sum(count for _, count, _, _ in new_days)
 
-        today = date.today()
-        last_log_date = rows[0][0]
+    @staticmethod
+    def _record_completion(cursor, habit_id, day, xp):
+        # MySQL applies SET assignments left to right, SQLite reads the old row;
+        # assigning longest_streak first gives both the pre-update values.
+        next_streak = (
+            "CASE WHEN last_completed_date = %s THEN current_streak + 1 "
+            "WHEN last_completed_date >= %s THEN current_streak ELSE 1 END"
+        )
+        cursor.execute(
+            "UPDATE habits SET "
+            "xp = xp + %s, "
+            f"longest_streak = CASE WHEN {next_streak} > longest_streak THEN {next_streak} ELSE longest_streak END, "
+            f"current_streak = {next_streak}, "
+            "last_completed_date = CASE WHEN last_completed_date >= %s THEN last_completed_date ELSE %s END "
+            "WHERE habit_id=%s",
+            (xp,) + (day - timedelta(days=1), day) * 3 + (day, day, habit_id)
+        )
+
+    def get_history(self, start, end):
+        # {date: completions}; a day is complete once it reaches daily_goal.
+        # Archived days read as completed, from one bitmap row per year.
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT log_date, completions FROM habit_logs WHERE habit_id=%s AND log_date BETWEEN %s AND %s",
+                (self.habit_id, start, end)
+            )
+            history = {row[0]: row[1] for row in cursor.fetchall()}
+            if start < archive.live_since():
+                for day in archive.load_days(cursor, [self.habit_id], start, end).get(self.habit_id, ()):
+                    history[day] = max(history.get(day, 0), self.daily_goal)
+            cursor.close()
+        return history
 
-        if (today - last_log_date).days > 1:
-            return 0
+    def get_streak(self):
+        return _live_streak(self.current_streak, self.last_completed_date)
 
-        streak = 0
-        current_check = last_log_date
+    @staticmethod
+    def get_streaks(habit_ids):
+        streaks = {habit_id: 0 for habit_id in habit_ids}
+        if not streaks:
+            return streaks
 
-        for r in rows:
-            if r[0] == current_check:
-                streak += 1
-                current_check -= timedelta(days=1)
-            else:
-                break
+        placeholders = ", ".join(["%s"] * len(streaks))
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT habit_id, current_streak, last_completed_date FROM habits WHERE habit_id IN ({placeholders})",
+                tuple(streaks)
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+
+        for habit_id, current_streak, last_completed_date in rows:
+            streaks[habit_id] = _live_streak(current_streak, last_completed_date)
+
+        return streaks
+
+    # --- Cached stats maintenance ---
+    @staticmethod
+    def _scan_stats(conn, habit_ids=None, include_archive=True):
+        # Recompute (current_streak, longest_streak, last_completed_date) from
+        # habit_logs and the archive in one sorted pass. current_streak is the run
+        # ending on last_completed_date; get_streak() decides whether it is still alive.
+        query = "SELECT habit_id, log_date FROM habit_logs WHERE completed=1"
+        params = ()
+        if habit_ids is not None:
+            if not habit_ids:
+                return {}
+            query += f" AND habit_id IN ({', '.join(['%s'] * len(habit_ids))})"
+            params = tuple(habit_ids)
+        query += " ORDER BY habit_id, log_date"
+
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        days = {}
+        for habit_id, log_date in cursor.fetchall():
+            days.setdefault(habit_id, []).append(log_date)
+
+        if include_archive:
+            for habit_id, archived in archive.load_days(cursor, habit_ids).items():
+                # Two sorted runs, which sorted() merges in linear time
+                days[habit_id] = sorted(archived + days.get(habit_id, []))
+        cursor.close()
+
+        stats = {}
+        for habit_id, dates in days.items():
+            current, longest, last = 0, 0, None
+            for log_date in dates:
+                if last == log_date:
+                    continue
+                if last is not None and (log_date - last).days == 1:
+                    current += 1
+                else:
+                    current = 1
+                longest = max(longest, current)
+                last = log_date
+            stats[habit_id] = (current, longest, last)
+
+        return stats
+
+    @staticmethod
+    def _all_ids(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT habit_id FROM habits")
+        ids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        return ids
+
+    @staticmethod
+    def _write_stats(conn, habit_ids=None, include_archive=True):
+        stats = Habit._scan_stats(conn, habit_ids, include_archive)
+        if habit_ids is None:
+            habit_ids = Habit._all_ids(conn)
+
+        cursor = conn.cursor()
+        cursor.executemany(
+            "UPDATE habits SET current_streak=%s, longest_streak=%s, last_completed_date=%s WHERE habit_id=%s",
+            [stats.get(habit_id, (0, 0, None)) + (habit_id,) for habit_id in habit_ids]
+        )
+        cursor.close()
+        return len(habit_ids)
+
+    @staticmethod
+    def rebuild_stats(habit_ids=None, conn=None):
+        if conn is None:
+            with get_connection() as conn:
+                return Habit.rebuild_stats(habit_ids, conn)
+
+        count = Habit._write_stats(conn, habit_ids)
+        cursor = conn.cursor()
+        if habit_ids is None:
+            changes.record_all(cursor)
+        else:
+            changes.record(cursor, habit_ids)
+        cursor.close()
+        conn.commit()
+        return count
+
+    @staticmethod
+    def verify_stats():
+        with get_connection() as conn:
+            expected = Habit._scan_stats(conn)
+            cursor = conn.cursor()
+            cursor.execute("SELECT habit_id, current_streak, longest_streak, last_completed_date FROM habits")
+            rows = cursor.fetchall()
+            cursor.close()
 
-        return streak
\ No newline at end of file
+        mismatches = []
+        for habit_id, current, longest, last in rows:
+            stored = (current, longest, last)
+            wanted = expected.get(habit_id, (0, 0, None))
+            if stored != wanted:
+                mismatches.append((habit_id, stored, wanted))
+        return mismatches
\ No newline at end of file
@@ -0,0 +1,247 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date
+
+from db_config import get_connection
+from models import Habit
+
+# --- OUTBOX SETTINGS ---
+# Local journal of writes waiting for the main database
+OUTBOX_PATH = os.environ.get("HABIT_GARDEN_OUTBOX_PATH", "habit_garden_outbox.db")
+FLUSH_BATCH = 200
+# An operation that keeps failing after this many tries is set aside so the rest can sync
+MAX_ATTEMPTS = 10
+
+
+class Outbox:
+    """Durable queue of habit writes, replayed against the database in order.
+
+    The UI records a write here (a local fsync'd SQLite file) and carries on;
+    flush() later applies queued operations one transaction each and removes
+    them. Completions for the same habit and day merge into one operation with
+    a count. Habits added while offline get a negative temporary id until
+    their add is flushed.
+
+    Each operation has a random op_key, stored in outbox_applied in the same
+    transaction as its write. If the commit lands but the outbox never hears
+    back (a dropped link, a crash), the replay finds the key and skips the
+    write. For that an operation must not change once flush() has read it:
+    later completions get an operation of their own, and deleting a habit
+    whose add is in flight queues a delete instead of dropping the add.
+    """
+
+    def __init__(self, path=OUTBOX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS ops (
+                    op_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    op_key TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    habit_id INTEGER,
+                    log_date TEXT,
+                    count INTEGER NOT NULL DEFAULT 1,
+                    name TEXT,
+                    daily_goal INTEGER,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    failed INTEGER NOT NULL DEFAULT 0
+                )"""
+            )
+            # Temporary ids of flushed adds, for writes queued against them later
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS id_map (temp_id INTEGER PRIMARY KEY, habit_id INTEGER NOT NULL)"
+            )
+
+        self.last_error = None
+        self.last_sync = None
+        # op_ids read by the running flush()
+        self._flushing = set()
+
+    def _resolve(self, habit_id):
+        habit_id = int(habit_id)
+        if habit_id < 0:
+            row = self._conn.execute("SELECT habit_id FROM id_map WHERE temp_id=?", (habit_id,)).fetchone()
+            if row:
+                return row[0]
+        return habit_id
+
+    # --- Queueing ---
+    def add(self, name, daily_goal=1):
+        with self._lock, self._conn:
+            op_id = self._conn.execute(
+                "INSERT INTO ops (op_key, kind, name, daily_goal) VALUES (?, 'add', ?, ?)",
+                (uuid.uuid4().hex, name, daily_goal)
+            ).lastrowid
+            self._conn.execute("UPDATE ops SET habit_id=? WHERE op_id=?", (-op_id, op_id))
+        return Habit(-op_id, name, daily_goal)
+
+    def log(self, habit_id, day=None):
+        day = (day or date.today()).isoformat()
+        with self._lock, self._conn:
+            habit_id = self._resolve(habit_id)
+            rows = self._conn.execute(
+                "SELECT op_id FROM ops WHERE kind='log' AND habit_id=? AND log_date=? AND failed=0",
+                (habit_id, day)
+            ).fetchall()
+            idle = [op_id for op_id, in rows if op_id not in self._flushing]
+            if idle:
+                self._conn.execute("UPDATE ops SET count = count + 1 WHERE op_id=?", (idle[0],))
+            else:
+                self._conn.execute("INSERT INTO ops (op_key, kind, habit_id, log_date) VALUES (?, 'log', ?, ?)",
+                                   (uuid.uuid4().hex, habit_id, day))
+
+    def delete(self, habit_id):
+        with self._lock, self._conn:
+            habit_id = self._resolve(habit_id)
+            # Queued completions for the habit no longer matter
+            self._conn.execute("DELETE FROM ops WHERE kind='log' AND habit_id=?", (habit_id,))
+            if habit_id < 0:
+                add = self._conn.execute("SELECT op_id FROM ops WHERE kind='add' AND habit_id=?",
+                                         (habit_id,)).fetchone()
+                if add is None:
+                    return
+                if add[0] not in self._flushing:
+                    # Never reached the database: dropping the queued add is enough
+                    self._conn.execute("DELETE FROM ops WHERE op_id=?", (add[0],))
+                    return
+                # The add is being applied; the delete below is remapped to its habit_id once it is done
+            exists = self._conn.execute(
+                "SELECT 1 FROM ops WHERE kind='delete' AND habit_id=? AND failed=0", (habit_id,)
+            ).fetchone()
+            if not exists:
+                self._conn.execute("INSERT INTO ops (op_key, kind, habit_id) VALUES (?, 'delete', ?)",
+                                   (uuid.uuid4().hex, habit_id))
+
+    # --- Reading ---
+    def pending_ops(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT op_id, kind, habit_id, log_date, count, name, daily_goal FROM ops "
+                "WHERE failed=0 ORDER BY op_id"
+            ).fetchall()
+
+    def status(self):
+        with self._lock:
+            pending, failed = self._conn.execute(
+                "SELECT COALESCE(SUM(failed = 0), 0), COALESCE(SUM(failed = 1), 0) FROM ops"
+            ).fetchone()
+        return {"pending": pending, "failed": failed, "last_error": self.last_error, "last_sync": self.last_sync}
+
+    def apply_pending(self, habits, include_added=True):
+        # Overlay queued writes on habits fetched from the database
+        ops = self.pending_ops()
+        deleted = {habit_id for _, kind, habit_id, _, _, _, _ in ops if kind == "delete"}
+        result = [h for h in habits if h.habit_id not in deleted]
+        by_id = {h.habit_id: h for h in result}
+
+        today = date.today().isoformat()
+        for _, kind, habit_id, log_date, count, name, daily_goal in ops:
+            if kind == "add" and include_added and habit_id not in deleted:
+                by_id[habit_id] = Habit(habit_id, name, daily_goal)
+                result.append(by_id[habit_id])
+            elif kind == "log" and log_date == today and habit_id in by_id:
+                for _ in range(count):
+                    by_id[habit_id].apply_completion()
+        return result
+
+    # --- Flushing ---
+    def flush(self, limit=FLUSH_BATCH):
+        # Apply up to `limit` queued operations, oldest first. Returns
+        # [(kind, queued habit_id, database habit_id)] for the ones applied;
+        # raises, leaving the rest queued, if the database can't be reached.
+        with self._lock:
+            ops = self._conn.execute(
+                "SELECT op_id, op_key, kind, habit_id, log_date, count, name, daily_goal FROM ops "
+                "WHERE failed=0 ORDER BY op_id LIMIT ?", (limit,)
+            ).fetchall()
+            self._flushing = {op[0] for op in ops}
+        applied = []
+        if not ops:
+            return applied
+
+        try:
+            with get_connection() as conn:
+                for op_id, op_key, kind, habit_id, log_date, count, name, daily_goal in ops:
+                    with self._lock:
+                        target = self._resolve(habit_id)
+                    try:
+                        target = self._apply(conn, op_key, kind, target, log_date, count, name, daily_goal)
+                    except Exception as e:
+                        # Leaving the with-block rolls back, even when the connection is gone
+                        self._record_failure(op_id, e)
+                        raise
+                    self._done(op_id, kind, habit_id, target)
+                    applied.append((kind, habit_id, target))
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        finally:
+            with self._lock:
+                self._flushing = set()
+
+        self.last_error = None
+        self.last_sync = time.time()
+        return applied
+
+    @staticmethod
+    def _apply(conn, op_key, kind, habit_id, log_date, count, name, daily_goal):
+        # The write and its op_key commit together; a key already there means an
+        # earlier flush applied the op and lost the acknowledgement
+        cursor = conn.cursor()
+        cursor.execute("SELECT habit_id FROM outbox_applied WHERE op_key=%s", (op_key,))
+        row = cursor.fetchone()
+        if row is not None:
+            cursor.close()
+            return row[0] if kind == "add" else habit_id
+
+        if kind == "add":
+            habit_id = Habit.add(name, daily_goal, conn=conn, commit=False)
+        elif kind == "log":
+            Habit.log_completions(habit_id, date.fromisoformat(log_date), count, conn=conn, commit=False)
+        elif kind == "delete":
+            Habit.delete(habit_id, conn=conn, commit=False)
+        cursor.execute("INSERT INTO outbox_applied (op_key, habit_id) VALUES (%s, %s)", (op_key, habit_id))
+        conn.commit()
+        cursor.close()
+        return habit_id
+
+    def _done(self, op_id, kind, habit_id, target):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM ops WHERE op_id=?", (op_id,))
+            self._flushing.discard(op_id)
+            if kind == "add":
+                self._conn.execute("INSERT OR REPLACE INTO id_map (temp_id, habit_id) VALUES (?, ?)",
+                                   (habit_id, target))
+                self._conn.execute("UPDATE ops SET habit_id=? WHERE habit_id=?", (target, habit_id))
+
+    def _record_failure(self, op_id, error):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE ops SET attempts = attempts + 1, last_error=?, failed = (attempts + 1 >= ?) WHERE op_id=?",
+                (str(error), MAX_ATTEMPTS, op_id)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox():
+    global _outbox
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                _outbox = Outbox()
+    return _outbox
\ No newline at end of file
@@ -0,0 +1,74 @@
+import json
+import os
+from bisect import bisect_right
+
+# --- PROGRESSION SETTINGS ---
+# Minimum XP for each plant stage, lowest first
+STAGES = [
+    (0, "Seed"),
+    (100, "Sprout"),
+    (200, "Small Plant"),
+    (300, "Budding"),
+    (400, "Blooming"),
+    (500, "Tree"),
+]
+
+BASE_XP = 50
+# Extra XP per completion for each step of daily goal above 1 (0.5 -> a goal of 3 earns 100)
+GOAL_BONUS = 0.5
+
+# Optional JSON file overriding the rules: {"stages": [[0, "Seed"], ...], "base_xp": 50, "goal_bonus": 0.5}
+RULES_PATH = os.environ.get("HABIT_GARDEN_PROGRESSION")
+
+
+class Progression:
+    """Plant stage and XP rules."""
+
+    def __init__(self, stages=STAGES, base_xp=BASE_XP, goal_bonus=GOAL_BONUS):
+        stages = sorted((int(min_xp), name) for min_xp, name in stages)
+        if not stages or stages[0][0] > 0:
+            raise ValueError("The first stage must start at 0 XP")
+
+        self.thresholds = [min_xp for min_xp, _ in stages]
+        self.names = [name for _, name in stages]
+        self.base_xp = base_xp
+        self.goal_bonus = goal_bonus
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as f:
+            rules = json.load(f)
+        return cls(rules.get("stages", STAGES), rules.get("base_xp", BASE_XP), rules.get("goal_bonus", GOAL_BONUS))
+
+    # --- Stages ---
+    def stage_index(self, xp):
+        return max(bisect_right(self.thresholds, xp) - 1, 0)
+
+    def stage(self, xp):
+        return self.names[self.stage_index(xp)]
+
+    def classify(self, xps):
+        # One stage name per XP value; bisect and the name list are bound once for the whole batch
+        thresholds, names, find = self.thresholds, self.names, bisect_right
+        return [names[max(find(thresholds, xp) - 1, 0)] for xp in xps]
+
+    def xp_range(self, stage):
+        # Inclusive (min, max) XP of a stage; the last stage has no upper bound
+        i = self.names.index(stage)
+        upper = self.thresholds[i + 1] - 1 if i + 1 < len(self.thresholds) else None
+        return self.thresholds[i], upper
+
+    # --- XP ---
+    def xp_for_completion(self, daily_goal=1):
+        # Harder goals earn more for a completed day
+        return round(self.base_xp * (1 + self.goal_bonus * (max(daily_goal, 1) - 1)))
+
+
+_progression = None
+
+
+def get_progression():
+    global _progression
+    if _progression is None:
+        _progression = Progression.from_file(RULES_PATH) if RULES_PATH else Progression()
+    return _progression
\ No newline at end of file
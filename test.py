@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+
+import db_config
+import migrations
+from models import Habit
+from outbox import Outbox
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Each test gets a fresh SQLite database and outbox in a temporary directory."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="habit_garden_test")
+        db_config.configure("sqlite", os.path.join(self.directory, "habits.db"))
+        migrations.upgrade()
+        self.outbox = Outbox(os.path.join(self.directory, "outbox.db"))
+
+    def tearDown(self):
+        self.outbox.close()
+        db_config.get_pool().close_all()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def flush_all(self):
+        while self.outbox.status()["pending"]:
+            self.outbox.flush()
+
+
+class OutboxReplayTest(DatabaseTestCase):
+    def lose_acknowledgement(self):
+        # The database commits, then the outbox fails before it removes the op
+        return mock.patch.object(Outbox, "_done", side_effect=ConnectionError("link dropped"))
+
+    def test_add_replayed_after_lost_acknowledgement_creates_one_habit(self):
+        queued = self.outbox.add("Read", 2)
+        with self.lose_acknowledgement(), self.assertRaises(ConnectionError):
+            self.outbox.flush()
+
+        applied = self.outbox.flush()
+        habits = Habit.get_all()
+        self.assertEqual([h.name for h in habits], ["Read"])
+        self.assertEqual(applied, [("add", queued.habit_id, habits[0].habit_id)])
+
+    def test_log_replayed_after_lost_acknowledgement_counts_once(self):
+        habit_id = Habit.add("Stretch", 3)
+        self.outbox.log(habit_id)
+        self.outbox.log(habit_id)
+        with self.lose_acknowledgement(), self.assertRaises(ConnectionError):
+            self.outbox.flush()
+
+        self.flush_all()
+        self.assertEqual(Habit.get(habit_id).today_completions, 2)
+
+    def test_writes_against_a_temporary_id_follow_its_add(self):
+        queued = self.outbox.add("Walk", 2)
+        self.assertLess(queued.habit_id, 0)
+        self.outbox.log(queued.habit_id)
+        self.flush_all()
+
+        # Written after the add synced, still against the id the UI knows
+        self.outbox.log(queued.habit_id)
+        self.flush_all()
+
+        habit = Habit.get_all()[0]
+        self.assertEqual(habit.today_completions, 2)
+        self.assertTrue(habit.goal_met_today)
+
+    def test_deleting_an_unsynced_habit_drops_its_add(self):
+        queued = self.outbox.add("Swim")
+        self.outbox.log(queued.habit_id)
+        self.outbox.delete(queued.habit_id)
+
+        self.assertEqual(self.outbox.status()["pending"], 0)
+        self.flush_all()
+        self.assertEqual(Habit.get_all(), [])
+
+    def test_completion_queued_during_flush_is_kept(self):
+        habit_id = Habit.add("Read", 3)
+        log_completions = Habit.log_completions
+
+        def second_click(*args, **kwargs):
+            self.outbox.log(habit_id)
+            return log_completions(*args, **kwargs)
+
+        self.outbox.log(habit_id)
+        with mock.patch.object(Habit, "log_completions", side_effect=second_click):
+            self.outbox.flush()
+        self.flush_all()
+        self.assertEqual(Habit.get(habit_id).today_completions, 2)
+
+    def test_habit_deleted_while_its_add_is_flushed_stays_deleted(self):
+        queued = self.outbox.add("Temp")
+        add = Habit.add
+
+        def delete_meanwhile(*args, **kwargs):
+            self.outbox.delete(queued.habit_id)
+            return add(*args, **kwargs)
+
+        with mock.patch.object(Habit, "add", side_effect=delete_meanwhile):
+            self.outbox.flush()
+        self.assertEqual(self.outbox.apply_pending(Habit.get_all()), [])
+        self.flush_all()
+        self.assertEqual(Habit.get_all(), [])
+
+
+class TodayCompletionsTest(unittest.TestCase):
+    def test_count_from_an_earlier_day_reads_as_none_today(self):
+        habit = Habit(1, "Read", 1, today_completions=1)
+        self.assertTrue(habit.goal_met_today)
+
+        with mock.patch("models.date") as fake_date:
+            fake_date.today.return_value = date.today() + timedelta(days=1)
+            self.assertEqual(habit.today_completions, 0)
+            self.assertTrue(habit.apply_completion())
+            self.assertEqual(habit.today_completions, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
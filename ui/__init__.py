@@ -1,3 +1,12 @@
-from .add_habit_window import AddHabitWindow
-from .habit_detail_window import HabitDetailWindow
-from .main_window import MainWindow
\ No newline at end of file
+# Windows are imported on first use, so startup only pays for the main window
+def __getattr__(name):
+    if name == "AddHabitWindow":
+        from .add_habit_window import AddHabitWindow
+        return AddHabitWindow
+    if name == "HabitDetailWindow":
+        from .habit_detail_window import HabitDetailWindow
+        return HabitDetailWindow
+    if name == "MainWindow":
+        from .main_window import MainWindow
+        return MainWindow
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -1,14 +1,13 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from models import Habit
 
 
 class AddHabitWindow(tk.Toplevel):
-    def __init__(self, parent, refresh_callback):
+    def __init__(self, parent, save_callback):
         super().__init__(parent)
         self.title("Add New Habit")
         self.geometry("350x250")
-        self.refresh_callback = refresh_callback
+        self.save_callback = save_callback
 
         # Make this window modal
         self.transient(parent)
@@ -39,8 +38,9 @@ class AddHabitWindow(tk.Toplevel):
         button_frame.pack(pady=20)
 
         tk.Button(button_frame, text="Cancel", command=self.destroy).pack(side=tk.LEFT, padx=10)
-        tk.Button(button_frame, text="Save Habit", bg="#4CAF50", fg="white", command=self.save_habit).pack(side=tk.LEFT,
-                                                                                                           padx=10)
+        self.save_button = tk.Button(button_frame, text="Save Habit", bg="#4CAF50", fg="white",
+                                     command=self.save_habit)
+        self.save_button.pack(side=tk.LEFT, padx=10)
 
     def save_habit(self):
         name = self.name_entry.get().strip()
@@ -59,11 +59,6 @@ class AddHabitWindow(tk.Toplevel):
             messagebox.showwarning("Invalid Input", "Daily goal must be a number greater than 0.")
             return
 
-        # Save to Database
-        Habit.add(name, daily_goal)
-
-        # Refresh the main list and close window
-        if self.refresh_callback:
-            self.refresh_callback()
-
-        self.destroy()
\ No newline at end of file
+        # Queue the new habit; it syncs to the database in the background
+        if self.save_callback(name, daily_goal):
+            self.destroy()
\ No newline at end of file
@@ -0,0 +1,116 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox
+
+import instrumentation
+
+POLL_INTERVAL_MS = 25
+
+
+def _run_action(action, fn, args):
+    # Attribute the queries this call makes to a named action in the metrics
+    with instrumentation.action(action):
+        return fn(*args)
+
+
+def start_thread(fn, *args, action=None):
+    # Long jobs (compaction, export) get a thread of their own so they never hold
+    # the runner's workers. Daemon, so an unfinished job can't keep the app open:
+    # callers pass it a cancel event and set it on close.
+    action = action or getattr(fn, "__qualname__", "background")
+    thread = threading.Thread(target=_run_action, args=(action, fn, args), name=f"habit-{action}", daemon=True)
+    thread.start()
+    return thread
+
+
+class BackgroundRunner:
+    """Runs model calls on worker threads and delivers results on the Tk thread.
+
+    Workers never touch Tk: finished futures are queued and drained by a
+    root.after() poll, which then calls on_success/on_error. Submitting with a
+    key supersedes any earlier request with the same key, so only the newest
+    result for e.g. a filter change is delivered. Quiet submissions (periodic
+    polls) don't count towards busy.
+    """
+
+    def __init__(self, root, max_workers=2):
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="habit-db")
+        self._done = queue.Queue()
+        self._latest = {}
+        self._pending = 0
+        self._visible = 0
+        self._polling = False
+        self.busy_callbacks = []
+
+    @property
+    def busy(self):
+        return self._visible > 0
+
+    def submit(self, fn, *args, on_success=None, on_error=None, key=None, action=None, quiet=False):
+        token = object()
+        if key is not None:
+            self._latest[key] = token
+
+        self._pending += 1
+        if not quiet:
+            self._visible += 1
+            if self._visible == 1:
+                self._notify_busy()
+
+        action = action or getattr(fn, "__qualname__", "background")
+        future = self._executor.submit(_run_action, action, fn, args)
+        future.add_done_callback(lambda f: self._done.put((f, key, token, on_success, on_error, quiet)))
+
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_INTERVAL_MS, self._poll)
+        return token
+
+    def cancel(self, key):
+        # The work still finishes, but its result is dropped
+        self._latest.pop(key, None)
+
+    def _poll(self):
+        was_busy = self.busy
+        while True:
+            try:
+                future, key, token, on_success, on_error, quiet = self._done.get_nowait()
+            except queue.Empty:
+                break
+
+            self._pending -= 1
+            if not quiet:
+                self._visible -= 1
+            if key is not None:
+                if self._latest.get(key) is not token:
+                    continue
+                del self._latest[key]
+
+            error = future.exception()
+            try:
+                if error is not None:
+                    (on_error or self.report_error)(error)
+                elif on_success:
+                    on_success(future.result())
+            except Exception as e:
+                print(f"Error in background callback: {e}")
+
+        if self._pending:
+            self.root.after(POLL_INTERVAL_MS, self._poll)
+        else:
+            self._polling = False
+        if was_busy and not self.busy:
+            self._notify_busy()
+
+    def _notify_busy(self):
+        for callback in self.busy_callbacks:
+            callback(self.busy)
+
+    def report_error(self, error):
+        messagebox.showerror("Database Error", f"Could not reach the habit database:\n{error}", parent=self.root)
+
+    def shutdown(self):
+        self._latest.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
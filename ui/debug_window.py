@@ -0,0 +1,74 @@
+import tkinter as tk
+from tkinter import ttk
+
+from db_config import get_pool
+from instrumentation import get_metrics, get_startup
+
+REFRESH_MS = 1000
+
+
+class DebugWindow(tk.Toplevel):
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Habit Garden - Database Metrics")
+        self.geometry("760x520")
+
+        self.text = tk.Text(self, font=("Courier New", 9), wrap="none", bd=0)
+        scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.text.yview)
+        self.text.configure(yscrollcommand=scrollbar.set)
+
+        button_frame = tk.Frame(self)
+        button_frame.pack(side=tk.BOTTOM, fill="x", pady=5)
+        tk.Button(button_frame, text="Reset", command=self.reset).pack(side=tk.LEFT, padx=10)
+        tk.Button(button_frame, text="Close", command=self.destroy).pack(side=tk.RIGHT, padx=10)
+
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text.pack(fill=tk.BOTH, expand=True)
+
+        self.refresh()
+
+    def reset(self):
+        get_metrics().reset()
+        self.refresh()
+
+    def refresh(self):
+        if not self.winfo_exists():
+            return
+
+        position = self.text.yview()[0]
+        self.text.config(state=tk.NORMAL)
+        self.text.delete("1.0", tk.END)
+        self.text.insert(tk.END, self.render(get_metrics().snapshot(), get_pool().stats(), get_startup().marks))
+        self.text.config(state=tk.DISABLED)
+        self.text.yview_moveto(position)
+
+        self.after(REFRESH_MS, self.refresh)
+
+    @staticmethod
+    def render(snapshot, pool, startup=None):
+        lines = [
+            f"Queries: {snapshot['total_queries']}   SQL time: {snapshot['total_sql_ms']:.1f} ms",
+            f"Connections opened: {snapshot['connections_opened']}   "
+            f"avg open {snapshot['connect_avg_ms']:.1f} ms, max {snapshot['connect_max_ms']:.1f} ms",
+            f"Pool: {pool['checked_out']} in use, {pool['idle']} idle, size {pool['size']}",
+            "Startup: " + (", ".join(f"{name} {ms:.0f} ms" for name, ms in (startup or {}).items()) or "-"),
+            "",
+            f"{'Action':<34}{'runs':>6}{'avg q':>8}{'max q':>7}{'avg sql ms':>12}{'avg wall ms':>13}",
+        ]
+
+        actions = sorted(snapshot["actions"].items(), key=lambda item: -item[1]["queries"])
+        for name, stats in actions:
+            runs = stats["count"]
+            lines.append(f"{name[:33]:<34}{runs:>6}{stats['queries'] / runs:>8.1f}{stats['max_queries']:>7}"
+                         f"{stats['sql_seconds'] * 1000 / runs:>12.2f}{stats['wall_seconds'] * 1000 / runs:>13.2f}")
+
+        lines += ["", "SQL latency histogram:"]
+        peak = max(snapshot["histogram"].values()) or 1
+        for label, count in snapshot["histogram"].items():
+            lines.append(f"  {label:>9} {count:>7} {'#' * round(count / peak * 40)}")
+
+        lines += ["", "Slow queries (newest last):"]
+        for entry in snapshot["slow_queries"][-15:]:
+            lines.append(f"  {entry['at']} {entry['ms']:>9.1f} ms  {entry['sql']}")
+
+        return "\n".join(lines)
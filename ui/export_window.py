@@ -0,0 +1,138 @@
+import threading
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+import exporter
+
+from .background import start_thread
+
+FORMAT_NAMES = {"CSV": "csv", "JSON Lines": "jsonl"}
+PROGRESS_POLL_MS = 200
+
+
+class ExportWindow(tk.Toplevel):
+    """Exports the database to a folder in the background, with progress.
+
+    Closing the window or pressing Stop ends the export at the next chunk; the
+    checkpoint it leaves lets a later export into the same folder resume.
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Export Data")
+        self.geometry("420x260")
+        self.transient(parent)
+
+        self.cancel_event = None
+        # Written by the export thread, read by poll_progress()
+        self.progress = None
+        self.outcome = None
+
+        tk.Label(self, text="Export Habits & History", font=("Helvetica", 14, "bold")).pack(pady=15)
+
+        form = tk.Frame(self)
+        form.pack(padx=20, fill="x")
+        form.columnconfigure(1, weight=1)
+
+        tk.Label(form, text="Folder:").grid(row=0, column=0, padx=5, sticky="e")
+        self.directory_var = tk.StringVar(self)
+        tk.Entry(form, textvariable=self.directory_var).grid(row=0, column=1, padx=5, sticky="ew")
+        tk.Button(form, text="Browse...", command=self.choose_directory).grid(row=0, column=2, padx=5)
+
+        tk.Label(form, text="Format:").grid(row=1, column=0, padx=5, pady=10, sticky="e")
+        self.format_var = tk.StringVar(self, value="CSV")
+        ttk.Combobox(form, textvariable=self.format_var, values=list(FORMAT_NAMES), width=12,
+                     state="readonly").grid(row=1, column=1, padx=5, pady=10, sticky="w")
+
+        self.gzip_var = tk.BooleanVar(self, value=False)
+        tk.Checkbutton(form, text="Compress (.gz)", variable=self.gzip_var).grid(row=2, column=1, padx=5, sticky="w")
+
+        self.progress_bar = ttk.Progressbar(self, maximum=1.0)
+        self.progress_bar.pack(padx=20, pady=(15, 5), fill="x")
+        self.status_label = tk.Label(self, text="")
+        self.status_label.pack()
+
+        button_frame = tk.Frame(self)
+        button_frame.pack(pady=10)
+        tk.Button(button_frame, text="Close", command=self.destroy).pack(side=tk.LEFT, padx=10)
+        self.start_button = tk.Button(button_frame, text="Export", bg="#4CAF50", fg="white", command=self.start)
+        self.start_button.pack(side=tk.LEFT, padx=10)
+
+    def choose_directory(self):
+        directory = filedialog.askdirectory(parent=self, title="Export to folder")
+        if directory:
+            self.directory_var.set(directory)
+
+    def start(self):
+        if self.cancel_event is not None:
+            # Running: the button is Stop
+            self.cancel_event.set()
+            self.status_label.config(text="Stopping after the current chunk...")
+            return
+
+        directory = self.directory_var.get().strip()
+        if not directory:
+            messagebox.showwarning("Required", "Please choose a folder to export to.", parent=self)
+            return
+
+        self.cancel_event = threading.Event()
+        self.progress = None
+        self.outcome = None
+        self.start_button.config(text="Stop")
+        self.status_label.config(text="Starting...")
+        # Its own thread, so a long export never holds up the main window's loads and syncs
+        start_thread(self.run_export, directory, FORMAT_NAMES[self.format_var.get()], self.gzip_var.get(),
+                     self.cancel_event, action="export")
+        self.poll_progress()
+
+    def run_export(self, directory, fmt, compress, cancel):
+        # Export thread: no Tk calls, poll_progress() picks up the outcome
+        try:
+            result = exporter.export_all(directory, fmt, compress, exporter.CHUNK_ROWS, False,
+                                         self.on_progress, cancel)
+            self.outcome = (self.on_finished, result)
+        except Exception as e:
+            self.outcome = (self.on_failed, e)
+
+    def on_progress(self, table, rows, fraction):
+        # Export thread: just hand the numbers over
+        self.progress = (table, rows, fraction)
+
+    def poll_progress(self):
+        if self.cancel_event is None or not self.winfo_exists():
+            return
+        if self.outcome:
+            callback, value = self.outcome
+            callback(value)
+            return
+        if self.progress:
+            table, rows, fraction = self.progress
+            # habits are a sliver of the work next to habit_logs
+            self.progress_bar.config(value=fraction if table == "habit_logs" else 0)
+            self.status_label.config(text=f"{table}: {rows:,} rows")
+        self.after(PROGRESS_POLL_MS, self.poll_progress)
+
+    def finish(self, text):
+        self.cancel_event = None
+        self.start_button.config(text="Export")
+        self.status_label.config(text=text)
+
+    def on_finished(self, result):
+        if not self.winfo_exists():
+            return
+        counts, finished = result
+        if finished:
+            self.progress_bar.config(value=1.0)
+            self.finish(f"Done: {counts['habits']:,} habits, {counts['habit_logs']:,} log rows.")
+        else:
+            self.finish("Stopped. Export to the same folder again to resume.")
+
+    def on_failed(self, error):
+        if self.winfo_exists():
+            self.finish("Export failed. Export to the same folder again to resume.")
+        print(f"Export error: {error}")
+
+    def destroy(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+        super().destroy()
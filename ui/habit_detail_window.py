@@ -1,7 +1,7 @@
 import tkinter as tk
 from tkinter import ttk
-from db_config import get_connection
-from models import Habit
+import analytics
+from models import RECENT_DAYS
 from datetime import date, timedelta
 
 COLORS = {
@@ -11,13 +11,32 @@ COLORS = {
     "white": "#FFFFFF"
 }
 
+HISTORY_PAGE_DAYS = RECENT_DAYS
+
+# Weekday heatmap colours, from no completions to every day
+HEAT_LOW = (0xE4, 0xE0, 0xC0)
+HEAT_HIGH = (0x48, 0xA0, 0x48)
+
+
+def heat_color(rate):
+    rgb = (round(low + (high - low) * rate) for low, high in zip(HEAT_LOW, HEAT_HIGH))
+    return "#{:02X}{:02X}{:02X}".format(*rgb)
+
+
+def percent(rate):
+    return "—" if rate is None else f"{rate:.0%}"
+
 
 class HabitDetailWindow(tk.Toplevel):
-    def __init__(self, parent, habit):
+    def __init__(self, parent, habit, worker):
         super().__init__(parent)
         self.habit = habit
+        self.worker = worker
+        self.history_key = f"history:{id(self)}"
+        self.recent_key = f"recent:{id(self)}"
+        self.stats_key = f"stats:{id(self)}"
         self.title(f"Details: {habit.name}")
-        self.geometry("400x550")
+        self.geometry("420x760")
         self.configure(bg=COLORS["bg_main"])
 
         # --- HEADER ---
@@ -25,19 +44,23 @@ class HabitDetailWindow(tk.Toplevel):
                  bg=COLORS["bg_main"], fg=COLORS["text"]).pack(pady=(20, 10))
 
         # --- STATS CARD ---
-        stats_frame = tk.Frame(self, bg=COLORS["white"], bd=1, relief="solid")
-        stats_frame.pack(pady=10, padx=20, fill="x", ipadx=10, ipady=10)
+        self.stats_frame = tk.Frame(self, bg=COLORS["white"], bd=1, relief="solid")
+        self.stats_frame.pack(pady=10, padx=20, fill="x", ipadx=10, ipady=10)
 
-        def add_stat(row, label, value):
-            tk.Label(stats_frame, text=label, font=("Segoe UI", 10, "bold"),
-                     bg=COLORS["white"], fg="#555").grid(row=row, column=0, sticky="w", padx=10, pady=5)
-            tk.Label(stats_frame, text=value, font=("Segoe UI", 10),
-                     bg=COLORS["white"], fg="#000").grid(row=row, column=1, sticky="w", padx=10, pady=5)
+        self.stat_labels = {}
+        self.show_habit_stats()
+        self.stats_status = self.add_stat(4, "Statistics:", "Loading...")
 
-        add_stat(0, "Total XP:", f"{habit.xp}")
-        add_stat(1, "Daily Goal:", f"{habit.daily_goal} / day")
-        current_streak = habit.get_streak()
-        add_stat(2, "Current Streak:", f"🔥 {current_streak} days")
+        # --- WEEKDAY HEATMAP ---
+        heatmap_frame = tk.Frame(self, bg=COLORS["bg_main"])
+        heatmap_frame.pack(padx=20, fill="x")
+        self.heat_cells = []
+        for column, name in enumerate(analytics.WEEKDAYS):
+            heatmap_frame.columnconfigure(column, weight=1)
+            cell = tk.Label(heatmap_frame, text=f"{name}\n—", font=("Segoe UI", 9),
+                            bg=heat_color(0), fg=COLORS["text"], width=5, pady=4)
+            cell.grid(row=0, column=column, padx=1, sticky="ew")
+            self.heat_cells.append(cell)
 
         # --- HISTORY SECTION ---
         history_header_frame = tk.Frame(self, bg=COLORS["bg_main"])
@@ -56,7 +79,8 @@ class HabitDetailWindow(tk.Toplevel):
                                     font=("Segoe UI", 10))
         filter_combo.pack(side=tk.RIGHT)
 
-        filter_combo.bind("<<ComboboxSelected>>", lambda event: self.load_history())
+        # Filtering only re-renders the days already fetched
+        filter_combo.bind("<<ComboboxSelected>>", lambda event: self.show_history())
 
         list_frame = tk.Frame(self, bg=COLORS["bg_main"])
         list_frame.pack(fill="both", expand=True, padx=20, pady=5)
@@ -65,63 +89,184 @@ class HabitDetailWindow(tk.Toplevel):
                                        activestyle='none', bd=0, highlightthickness=1)
         self.history_list.pack(side=tk.LEFT, fill="both", expand=True)
 
-        scrollbar = tk.Scrollbar(list_frame, orient="vertical", command=self.history_list.yview)
-        scrollbar.pack(side=tk.RIGHT, fill="y")
-        self.history_list.config(yscrollcommand=scrollbar.set)
+        self.scrollbar = tk.Scrollbar(list_frame, orient="vertical", command=self.history_list.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill="y")
+        self.history_list.config(yscrollcommand=self.on_history_scroll)
 
+        # Fetched window of history: every day from oldest_loaded to today
+        self.history = {}
+        self.oldest_loaded = date.today() + timedelta(days=1)
+        self.page_loading = False
+        self.loading_marker = False
+        self.rendered = 0
+
+        self.history_list.insert(tk.END, " Loading history...")
         self.load_history()
 
+        self.load_stats()
+
         tk.Button(self, text="Close", bg=COLORS["primary"], fg="white", font=("Segoe UI", 10, "bold"),
                   padx=20, pady=5, bd=0, command=self.destroy).pack(pady=20)
 
+    def add_stat(self, row, label, value):
+        # Rows are created once; later calls update the value in place
+        if row in self.stat_labels:
+            self.stat_labels[row].config(text=value)
+            return self.stat_labels[row]
+
+        tk.Label(self.stats_frame, text=label, font=("Segoe UI", 10, "bold"),
+                 bg=COLORS["white"], fg="#555").grid(row=row, column=0, sticky="w", padx=10, pady=5)
+        value_label = tk.Label(self.stats_frame, text=value, font=("Segoe UI", 10),
+                               bg=COLORS["white"], fg="#000")
+        value_label.grid(row=row, column=1, sticky="w", padx=10, pady=5)
+        self.stat_labels[row] = value_label
+        return value_label
+
+    def show_habit_stats(self):
+        habit = self.habit
+        self.add_stat(0, "Total XP:", f"{habit.xp}")
+        self.add_stat(1, "Daily Goal:", f"{habit.daily_goal} / day")
+        self.add_stat(2, "Current Streak:", f"🔥 {habit.get_streak()} days")
+        self.add_stat(3, "Today:", f"{habit.today_completions} / {habit.daily_goal}")
+
+    def load_stats(self):
+        self.worker.submit(analytics.get_stats, self.habit, on_success=self.show_stats,
+                           on_error=self.show_stats_error, key=self.stats_key, action="load_stats")
+
+    def refresh(self, habit):
+        # The habit was changed elsewhere (habit is None once it's deleted)
+        if habit is None:
+            self.destroy()
+            return
+
+        self.habit = habit
+        self.show_habit_stats()
+        self.load_stats()
+        # Only the newest days can have changed; older pages stay as fetched
+        self.worker.submit(lambda: habit.recent_history, on_success=self.update_recent,
+                           key=self.recent_key, action="load_history", quiet=True)
+
+    def update_recent(self, logs):
+        self.history.update(logs)
+        if not self.page_loading:
+            self.show_history()
+
+    def show_stats(self, stats):
+        self.stats_status.config(text=f"{percent(stats.completion_rate)} of "
+                                      f"{stats.age} days ({stats.completed_days} met)")
+        self.add_stat(5, "Longest Streak:", f"🏆 {stats.longest_streak} days")
+
+        week = stats.rolling(7, 1)[0]
+        month = stats.rolling(30, 1)[0]
+        self.add_stat(6, "7 / 30-Day Average:", f"{percent(week)} / {percent(month)}")
+
+        months = stats.periods("month")[:3]
+        self.add_stat(7, "By Month:", "   ".join(
+            f"{start:%b} {percent(completed / active if active else None)}" for start, completed, active in months))
+
+        for cell, name, (completed, active) in zip(self.heat_cells, analytics.WEEKDAYS, stats.weekdays()):
+            rate = completed / active if active else None
+            cell.config(text=f"{name}\n{percent(rate)}", bg=heat_color(rate or 0),
+                        fg=COLORS["white"] if (rate or 0) > 0.6 else COLORS["text"])
+
+    def show_stats_error(self, error):
+        self.stats_status.config(text="Error loading statistics.")
+        print(f"Error: {error}")
+
+    def has_more_history(self):
+        return self.oldest_loaded > self.habit.created_at
+
     def load_history(self):
+        # Fetch the next (older) page of days
+        if self.page_loading or not self.has_more_history():
+            return
+
+        end = self.oldest_loaded - timedelta(days=1)
+        start = end - timedelta(days=HISTORY_PAGE_DAYS - 1)
+
+        self.page_loading = True
+        if self.rendered:
+            self.history_list.insert(tk.END, " Loading older history...")
+            self.loading_marker = True
+
+        if end >= date.today():
+            # The newest page is the habit's cached recent history
+            fetch = lambda: self.habit.recent_history
+        else:
+            fetch = lambda: self.habit.get_history(start, end)
+
+        self.worker.submit(fetch,
+                           on_success=lambda logs: self.add_history_page(start, end, logs),
+                           on_error=self.show_history_error, key=self.history_key)
+
+    def add_history_page(self, start, end, logs):
+        if self.loading_marker:
+            self.history_list.delete(tk.END)
+            self.loading_marker = False
+
+        self.page_loading = False
+        self.history.update(logs)
+        self.oldest_loaded = start
+        self.render_days(end, start)
+
+    def on_history_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+
+        # Reached the bottom: page in older days
+        if float(last) >= 1.0:
+            self.after_idle(self.load_history)
+
+    def show_history(self):
         self.history_list.delete(0, tk.END)
+        self.loading_marker = False
+        self.rendered = 0
+        self.render_days(date.today(), self.oldest_loaded)
 
+    def render_days(self, newest, oldest):
         current_filter = self.filter_var.get()
-        today = date.today()
-
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
-            # 1. Fetch ALL logs
-            cursor.execute(
-                "SELECT log_date, completed FROM habit_logs WHERE habit_id=%s",
-                (self.habit.habit_id,)
-            )
-            rows = cursor.fetchall()
-
-            # Map existing logs
-            existing_logs = {row[0]: row[1] for row in rows}
-            records_found = False
-
-            # 2. Iterate LAST 30 DAYS
-            for i in range(30):
-                check_date = today - timedelta(days=i)
-
-                # Check if we have data for this date
-                is_completed = existing_logs.get(check_date, False)
-
-                # Skip dates before habit creation
-                if not is_completed and check_date < self.habit.created_at:
-                    continue
-
-                # Filter Logic
-                if current_filter == "Completed" and not is_completed:
-                    continue
-
-                if current_filter == "Missed" and is_completed:
-                    continue
-
-                records_found = True
-                status = "✅ Completed" if is_completed else "❌ Missed"
-                self.history_list.insert(tk.END, f" {check_date}  —  {status}")
-
-            if not records_found:
-                self.history_list.insert(tk.END, f" No records found for: {current_filter}")
-
-        except Exception as e:
-            self.history_list.insert(tk.END, "Error loading history.")
-            print(f"Error: {e}")
-        finally:
-            cursor.close()
-            conn.close()
\ No newline at end of file
+
+        if not self.rendered:
+            self.history_list.delete(0, tk.END)
+
+        check_date = newest
+        while check_date >= oldest:
+            # Check if we have data for this date
+            completions = self.history.get(check_date, 0)
+            is_completed = completions >= self.habit.daily_goal
+            day = check_date
+            check_date -= timedelta(days=1)
+
+            # Skip dates before habit creation
+            if not is_completed and day < self.habit.created_at:
+                continue
+
+            # Filter Logic
+            if current_filter == "Completed" and not is_completed:
+                continue
+
+            if current_filter == "Missed" and is_completed:
+                continue
+
+            self.rendered += 1
+            if is_completed:
+                status = "✅ Completed"
+            elif completions:
+                status = f"🟡 {completions}/{self.habit.daily_goal} done"
+            else:
+                status = "❌ Missed"
+            self.history_list.insert(tk.END, f" {day}  —  {status}")
+
+        if not self.rendered and not self.has_more_history():
+            self.history_list.insert(tk.END, f" No records found for: {current_filter}")
+
+    def show_history_error(self, error):
+        self.page_loading = False
+        self.history_list.delete(0, tk.END)
+        self.history_list.insert(tk.END, "Error loading history.")
+        print(f"Error: {error}")
+
+    def destroy(self):
+        self.worker.cancel(self.history_key)
+        self.worker.cancel(self.recent_key)
+        self.worker.cancel(self.stats_key)
+        super().destroy()
\ No newline at end of file
@@ -0,0 +1,89 @@
+import os
+from collections import OrderedDict
+
+ASSETS_DIR = "assets"
+
+STAGE_FILES = {
+    "Seed": "seed.png",
+    "Sprout": "sprout.png",
+    "Small Plant": "small_plant.png",
+    "Budding": "budding.png",
+    "Blooming": "blooming.png",
+    "Tree": "tree.png"
+}
+
+ICON_FILE = "icon.png"
+ICON_SIZE = (64, 64)
+STAGE_IMAGE_SIZE = (200, 200)
+
+# Decoded off the Tk thread at startup (MainWindow.stream_images)
+STARTUP_IMAGES = [(ICON_FILE, ICON_SIZE)] + [(filename, STAGE_IMAGE_SIZE) for filename in STAGE_FILES.values()]
+
+
+class ImageCache:
+    """Decoded, resized PhotoImages keyed by (file, size), least recently used evicted first.
+
+    PIL is imported on first decode rather than at startup. decode() does only
+    PIL work and is safe on a worker thread; put() turns its result into a
+    PhotoImage and must run on the Tk thread.
+    """
+
+    def __init__(self, max_entries=24):
+        self.max_entries = max_entries
+        self._images = OrderedDict()
+
+    def get(self, filename, size, load=True):
+        # With load=False a cache miss returns None instead of decoding on the spot
+        key = (filename, size)
+        if key in self._images:
+            self._images.move_to_end(key)
+            return self._images[key]
+        if not load:
+            return None
+        return self.put(filename, size, self.decode(filename, size))
+
+    @staticmethod
+    def decode(filename, size):
+        path = os.path.join(ASSETS_DIR, filename)
+        if not os.path.exists(path):
+            return None
+        try:
+            from PIL import Image
+            return Image.open(path).resize(size, Image.LANCZOS)
+        except Exception as e:
+            print(f"Error loading image {path}: {e}")
+            return None
+
+    def put(self, filename, size, image):
+        img = None
+        if image is not None:
+            try:
+                from PIL import ImageTk
+                img = ImageTk.PhotoImage(image)
+            except Exception as e:
+                print(f"Error loading image {filename}: {e}")
+
+        # Missing/broken files are cached too, so we don't hit the disk on every click
+        self._images[(filename, size)] = img
+        if len(self._images) > self.max_entries:
+            self._images.popitem(last=False)
+        return img
+
+    def stage_image(self, stage, size=STAGE_IMAGE_SIZE, load=True):
+        # Stages renamed in the progression rules have no picture
+        filename = STAGE_FILES.get(stage)
+        return self.get(filename, size, load) if filename else None
+
+    def clear(self):
+        self._images.clear()
+
+
+_cache = None
+
+
+def get_image_cache():
+    # Created on first use: PhotoImages need a Tk root to exist
+    global _cache
+    if _cache is None:
+        _cache = ImageCache()
+    return _cache
@@ -1,11 +1,18 @@
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
+import analytics
+import archive
+import migrations
+from changes import ChangeFeed, latest_version
+from habit_index import HabitIndex
+from instrumentation import get_startup
 from models import Habit
-from PIL import Image, ImageTk
-import os
+from outbox import get_outbox
+from progression import get_progression
 
-from .add_habit_window import AddHabitWindow
-from .habit_detail_window import HabitDetailWindow
+from .background import BackgroundRunner, start_thread
+from .images import ICON_FILE, STARTUP_IMAGES, ImageCache, get_image_cache
 
 # --- THEME CONFIGURATION ---
 COLORS = {
@@ -23,25 +30,63 @@ FONT_MAIN = ("Arial", 10)
 FONT_BOLD = ("Arial", 10, "bold")
 FONT_TITLE = ("Arial", 22, "bold")
 
+# --- LIST PAGING ---
+# Gardens bigger than this switch to a windowed list fetched page by page
+PAGED_MODE_THRESHOLD = 500
+PAGE_SIZE = 100
+MAX_LOADED_PAGES = 3
+
+ALL_STAGES = "All stages"
+SEARCH_DELAY_MS = 150
+
+# Outbox flush retry delay while the database is unreachable, doubling up to the maximum
+SYNC_RETRY_MS = 1000
+SYNC_RETRY_MAX_MS = 60000
+
+# How often to look for writes made by other clients of the same database
+CHANGE_POLL_MS = 3000
+
+# Background history compaction, when HABIT_GARDEN_ARCHIVE_DAYS is set
+COMPACT_INTERVAL_MS = 24 * 60 * 60 * 1000
+
+HEADINGS = {
+    "#0": ("Habit Name", "name"),
+    "XP": ("✨ XP", "xp"),
+    "Stage": ("🌱 Plant Stage", "stage"),
+    "Streak": ("🔥 Streak", "streak"),
+    "Today": ("📅 Today", None),
+}
+
 
 class MainWindow:
-    def __init__(self, root):
+    def __init__(self, root, outbox=None, auto_sync=True):
         self.root = root
         self.root.title("Habit Garden")
         self.root.geometry("850x700")
         self.root.configure(bg=COLORS["bg_main"])
 
-        # --- SET APPLICATION ICON ---
-        icon_path = os.path.join("assets", "icon.png")
-
-        if os.path.exists(icon_path):
-            try:
-                icon_img = Image.open(icon_path).resize((64, 64), Image.LANCZOS)
-                self.app_icon = ImageTk.PhotoImage(icon_img)
-                self.root.iconphoto(True, self.app_icon)
-            except Exception as e:
-                print(f"Error loading icon: {e}")
-        # ------------------------------------------------
+        self.images = get_image_cache()
+        self.progression = get_progression()
+        self.outbox = outbox or get_outbox()
+        # False leaves writes from an earlier session queued until the next write (bench.py)
+        self.auto_sync = auto_sync
+        self.worker = BackgroundRunner(root)
+        self.compaction = None
+        self.stop_compaction = threading.Event()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+        # --- MENU ---
+        menubar = tk.Menu(root)
+        file_menu = tk.Menu(menubar, tearoff=0)
+        file_menu.add_command(label="Export Data...", command=self.open_export_window)
+        file_menu.add_separator()
+        file_menu.add_command(label="Quit", command=self.close)
+        menubar.add_cascade(label="File", menu=file_menu)
+        self.root.config(menu=menubar)
+
+        # The icon is set by stream_images() once decoded
+        self.app_icon = None
+        self.images_pending = 0
 
         # --- STYLE CONFIGURATION ---
         self.style = ttk.Style()
@@ -102,6 +147,15 @@ class MainWindow:
         tk.Label(header_frame, text="Plant seeds, track habits, watch them grow!",
                  font=("Arial", 10, "italic"), bg=COLORS["bg_main"], fg=COLORS["text"]).pack()
 
+        self.loading_label = tk.Label(header_frame, text="", font=FONT_MAIN,
+                                      bg=COLORS["bg_main"], fg=COLORS["secondary"])
+        self.loading_label.pack()
+        self.worker.busy_callbacks.append(self.show_loading)
+
+        self.sync_label = tk.Label(header_frame, text="", font=FONT_MAIN,
+                                   bg=COLORS["bg_main"], fg=COLORS["text"])
+        self.sync_label.pack()
+
         # --- ACTION BUTTONS ---
         self.button_frame = tk.Frame(root, bg=COLORS["bg_main"])
         self.button_frame.pack(pady=20, fill="x", side=tk.BOTTOM)
@@ -131,76 +185,604 @@ class MainWindow:
                                      font=FONT_BOLD, bg=COLORS["bg_main"], fg=COLORS["text"])
         self.status_label.pack(pady=5)
 
+        # --- SEARCH BAR ---
+        search_frame = tk.Frame(root, bg=COLORS["bg_main"], padx=20)
+        search_frame.pack(fill="x", pady=(0, 8))
+
+        self.search_var = tk.StringVar()
+        self.stage_var = tk.StringVar(value=ALL_STAGES)
+        self.min_streak_var = tk.StringVar()
+        self.max_streak_var = tk.StringVar()
+
+        tk.Label(search_frame, text="🔍", font=FONT_MAIN, bg=COLORS["bg_main"]).pack(side=tk.LEFT)
+        self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=24)
+        self.search_entry.pack(side=tk.LEFT, padx=(4, 12))
+
+        ttk.Combobox(search_frame, textvariable=self.stage_var, state="readonly", width=12,
+                     values=[ALL_STAGES] + self.progression.names).pack(side=tk.LEFT, padx=(0, 12))
+
+        tk.Label(search_frame, text="🔥 Streak", font=FONT_MAIN,
+                 bg=COLORS["bg_main"], fg=COLORS["text"]).pack(side=tk.LEFT)
+        ttk.Spinbox(search_frame, textvariable=self.min_streak_var, from_=0, to=9999,
+                    width=5).pack(side=tk.LEFT, padx=4)
+        tk.Label(search_frame, text="to", font=FONT_MAIN,
+                 bg=COLORS["bg_main"], fg=COLORS["text"]).pack(side=tk.LEFT)
+        ttk.Spinbox(search_frame, textvariable=self.max_streak_var, from_=0, to=9999,
+                    width=5).pack(side=tk.LEFT, padx=4)
+
+        ttk.Button(search_frame, text="Clear", command=self.clear_filters,
+                   style="Secondary.TButton").pack(side=tk.LEFT, padx=(12, 0))
+
+        self.filter_job = None
+        for var in (self.search_var, self.stage_var, self.min_streak_var, self.max_streak_var):
+            var.trace_add("write", self.on_filter_changed)
+        self.search_entry.bind("<Escape>", lambda event: self.clear_filters())
+        self.root.bind("<Control-f>", lambda event: self.search_entry.focus_set())
+
         # --- TREEVIEW (HABIT LIST) ---
         list_frame = tk.Frame(root, bg=COLORS["bg_main"], padx=20)
         list_frame.pack(fill=tk.BOTH, expand=True)
 
-        self.tree = ttk.Treeview(list_frame, columns=("XP", "Stage", "Streak"), style="Treeview")
+        self.tree = ttk.Treeview(list_frame, columns=("XP", "Stage", "Streak", "Today"), style="Treeview")
 
-        self.tree.heading("#0", text="Habit Name", anchor="w")
+        self.tree.heading("#0", anchor="w")
         self.tree.column("#0", width=250, stretch=tk.YES)
 
-        # Headings
-        self.tree.heading("XP", text="✨ XP")
+        # Headings (click to sort)
         self.tree.column("XP", width=80, anchor="center")
-        self.tree.heading("Stage", text="🌱 Plant Stage")
         self.tree.column("Stage", width=150, anchor="center")
-        self.tree.heading("Streak", text="🔥 Streak")
         self.tree.column("Streak", width=80, anchor="center")
+        self.tree.column("Today", width=80, anchor="center")
+        for column, (_, sort) in HEADINGS.items():
+            if sort:
+                self.tree.heading(column, command=lambda s=sort: self.sort_by(s))
 
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscroll=scrollbar.set)
+        self.scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscroll=self.on_tree_scroll)
 
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.tag_configure("odd", background=COLORS["bg_frame"])
+        self.tree.tag_configure("even", background=COLORS["white"])
 
         self.tree.bind("<<TreeviewSelect>>", lambda event: self.update_plant_image())
         self.tree.bind("<Double-1>", self.open_habit_detail)
+        self.root.bind("<F12>", self.open_debug_window)
 
         self.habits = []
+        self.index = HabitIndex()
         self.streaks = {}
+        self.rows = {}
+
+        # Sorting and paged-mode window state
+        self.sort = "habit_id"
+        self.descending = False
+        self.paged = False
+        self.at_start = True
+        self.at_end = True
+        self.page_loading = False
+        self.update_headings()
+
+        # Outbox sync state
+        self.sync_job = None
+        self.syncing = False
+        self.sync_again = False
+        self.sync_delay = SYNC_RETRY_MS
+
+        # Changes made by other clients, and the detail windows to pass them on to
+        self.changes = None
+        self.poll_delay = CHANGE_POLL_MS
+        self.detail_windows = []
+
+        # Set while the database can't be reached at startup; retried with backoff
+        self.database_error = None
+        self.connect_delay = SYNC_RETRY_MS
+
+        # Everything below finishes on the worker, so the skeleton paints first
+        self.connect_database()
+        self.stream_images()
+
+    # --- Startup ---
+    @staticmethod
+    def prepare_database():
+        # The change log position is read before the first load, so nothing written in between is missed
+        migrations.upgrade()
+        return latest_version()
+
+    def connect_database(self):
+        self.worker.submit(self.prepare_database, on_success=self.on_database_ready,
+                           on_error=self.on_database_unavailable, action="upgrade_schema")
+
+    def on_database_unavailable(self, error):
+        # Offline from the start: show the habits only the outbox knows about and keep trying
+        print(f"Database unavailable: {error}")
+        if self.database_error is None:
+            self.on_habits_loaded((False, True, PAGE_SIZE, self.outbox.apply_pending([])))
+        self.database_error = str(error)
+        self.update_sync_status()
+        self.root.after(self.connect_delay, self.connect_database)
+        self.connect_delay = min(self.connect_delay * 2, SYNC_RETRY_MAX_MS)
+
+    def on_database_ready(self, version):
+        self.database_error = None
+        self.changes = ChangeFeed(version)
         self.load_habits()
+        # Writes left over from an earlier session
+        if self.auto_sync:
+            self.schedule_sync()
+        self.root.after(CHANGE_POLL_MS, self.poll_changes)
+        if archive.ARCHIVE_DAYS:
+            self.compact_history()
+
+    def compact_history(self):
+        # Fold old log rows into the archive now and then; readers see the same history either way.
+        # A pass can take minutes, so it runs on its own thread and stops between batches on close.
+        if self.compaction is None or not self.compaction.is_alive():
+            self.compaction = start_thread(self.run_compaction, self.stop_compaction, action="compact_history")
+        self.root.after(COMPACT_INTERVAL_MS, self.compact_history)
+
+    @staticmethod
+    def run_compaction(cancel):
+        try:
+            archive.compact(int(archive.ARCHIVE_DAYS), cancel=cancel)
+        except Exception as e:
+            print(f"Compaction error: {e}")
+
+    def stream_images(self):
+        # Decode the icon and stage images on the worker; each PhotoImage is built here as it arrives
+        self.images_pending = len(STARTUP_IMAGES)
+        for filename, size in STARTUP_IMAGES:
+            self.worker.submit(ImageCache.decode, filename, size,
+                               on_success=lambda image, f=filename, s=size: self.on_image_decoded(f, s, image),
+                               action="decode_image")
+
+    def on_image_decoded(self, filename, size, image):
+        img = self.images.put(filename, size, image)
+        if filename == ICON_FILE and img:
+            self.app_icon = img
+            self.root.iconphoto(True, img)
+
+        self.images_pending -= 1
+        if not self.images_pending:
+            self.update_plant_image()
+            get_startup().mark("images_ready")
 
     # --- Methods ---
     def load_habits(self):
-        self.habits = Habit.get_all()
+        # In paged mode, reload the current window starting from its first row
+        start = None
+        if self.paged and not self.at_start and self.habits:
+            start = self.page_key(self.habits[0])
+        limit = max(len(self.habits), PAGE_SIZE)
+
+        self.worker.submit(self.fetch_habits, self.outbox, self.sort, self.descending, start, limit,
+                           self.page_filters(), on_success=self.on_habits_loaded, key="load_habits",
+                           action="load_habits")
+
+    @staticmethod
+    def fetch_habits(outbox, sort, descending, start, limit, filters):
+        # Runs on the worker thread. Small gardens are filtered in memory, paged ones by the
+        # database; either way writes still waiting in the outbox are laid over the result
+        if Habit.count() <= PAGED_MODE_THRESHOLD:
+            habits = outbox.apply_pending(Habit.get_all())
+            habits.sort(key=lambda h: h.sort_key(sort), reverse=descending)
+            return False, start is None, limit, habits
+        habits = Habit.get_page(sort, descending, after=start, inclusive=True, limit=limit, filters=filters)
+        return True, start is None, limit, outbox.apply_pending(habits, include_added=False)
+
+    def on_habits_loaded(self, result):
+        paged, from_start, limit, habits = result
+        self.paged = paged
+        if paged:
+            self.at_start = from_start
+            self.at_end = len(habits) < limit
+        else:
+            self.at_start = self.at_end = True
+        self.show_habits(habits)
+        get_startup().mark("data_ready")
+
+    def page_key(self, habit):
+        return habit.sort_key(self.sort), habit.habit_id
+
+    def sort_by(self, sort):
+        if self.sort == sort:
+            self.descending = not self.descending
+        else:
+            self.sort, self.descending = sort, sort != "name"
+
+        self.update_headings()
+        self.reload_from_start()
+
+    def reload_from_start(self):
+        self.worker.cancel("page")
+        self.page_loading = False
+        self.at_start = True
+        self.habits = []
+        self.load_habits()
+        self.tree.yview_moveto(0)
+
+    def update_headings(self):
+        arrow = " ▼" if self.descending else " ▲"
+        for column, (title, sort) in HEADINGS.items():
+            self.tree.heading(column, text=title + (arrow if sort == self.sort else ""))
+
+    def on_tree_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if not self.paged or self.page_loading:
+            return
+
+        if float(last) >= 0.95 and not self.at_end:
+            self.load_page(forward=True)
+        elif float(first) <= 0.05 and not self.at_start:
+            self.load_page(forward=False)
+
+    def load_page(self, forward):
+        if not self.habits:
+            return
+
+        self.page_loading = True
+        sort, descending, filters = self.sort, self.descending, self.page_filters()
+        if forward:
+            kwargs = {"after": self.page_key(self.habits[-1])}
+        else:
+            kwargs = {"before": self.page_key(self.habits[0])}
+
+        self.worker.submit(lambda: Habit.get_page(sort, descending, limit=PAGE_SIZE,
+                                                        filters=filters, **kwargs),
+                           on_success=lambda page: self.add_page(page, forward),
+                           on_error=self.on_page_error, key="page", action="load_page")
+
+    def on_page_error(self, error):
+        self.page_loading = False
+        self.worker.report_error(error)
+
+    def add_page(self, page, forward):
+        self.page_loading = False
+        children = self.tree.get_children()
+        anchor = children[int(self.tree.yview()[0] * len(children))] if children else None
+        limit = MAX_LOADED_PAGES * PAGE_SIZE
+
+        # Keep at most MAX_LOADED_PAGES in the tree, dropping from the far end
+        if forward:
+            self.at_end = len(page) < PAGE_SIZE
+            habits = self.habits + page
+            if len(habits) > limit:
+                habits = habits[len(habits) - limit:]
+                self.at_start = False
+        else:
+            self.at_start = len(page) < PAGE_SIZE
+            habits = page + self.habits
+            if len(habits) > limit:
+                habits = habits[:limit]
+                self.at_end = False
+
+        self.show_habits(habits)
+
+        # Keep the row that was at the top of the view in place
+        if anchor in self.rows:
+            self.tree.yview_moveto(self.tree.index(anchor) / max(len(self.habits), 1))
+
+    # --- Search and filters ---
+    def filters(self):
+        def streak_bound(var):
+            try:
+                return max(int(var.get()), 0)
+            except ValueError:
+                return None
 
-        for i in self.tree.get_children():
-            self.tree.delete(i)
+        stage = self.stage_var.get()
+        return {
+            "text": self.search_var.get().strip(),
+            "stage": stage if stage != ALL_STAGES else None,
+            "min_streak": streak_bound(self.min_streak_var),
+            "max_streak": streak_bound(self.max_streak_var),
+        }
+
+    def filtering(self):
+        f = self.filters()
+        return bool(f["text"] or f["stage"]) or f["min_streak"] is not None or f["max_streak"] is not None
+
+    def page_filters(self):
+        # The same filters in Habit.get_page() form, for paged mode
+        f = self.filters()
+        return {
+            "name": f["text"],
+            "xp": self.progression.xp_range(f["stage"]) if f["stage"] else None,
+            "streak": (f["min_streak"], f["max_streak"]),
+        }
 
-        for i, h in enumerate(self.habits):
-            streak = h.get_streak()
-            self.streaks[h.habit_id] = streak
-            stage = self.get_stage(h.xp)
+    def on_filter_changed(self, *args):
+        # Debounce typing: filter once the user pauses
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+        self.filter_job = self.root.after(SEARCH_DELAY_MS, self.apply_filter)
+
+    def apply_filter(self):
+        self.filter_job = None
+        if self.paged:
+            self.reload_from_start()
+        else:
+            self.render(self.visible_habits())
+
+    def clear_filters(self):
+        self.search_var.set("")
+        self.stage_var.set(ALL_STAGES)
+        self.min_streak_var.set("")
+        self.max_streak_var.set("")
+
+    def visible_habits(self):
+        # Paged windows arrive already filtered by the database
+        if self.paged or not self.filtering():
+            return self.habits
+        return self.index.search(**self.filters())
+
+    # --- List rendering ---
+    def show_habits(self, habits):
+        self.habits = habits
+        self.index.rebuild(habits)
+        self.streaks = {h.habit_id: h.get_streak() for h in self.habits}
+        self.render(self.visible_habits())
+
+    def render(self, habits):
+        # Diff against the rows already on screen so selection and scroll survive
+        order = [str(h.habit_id) for h in habits]
+        wanted = set(order)
+        stale = [iid for iid in self.tree.get_children() if iid not in wanted]
+        self.remove_rows(stale)
+
+        for h in habits:
+            self.upsert_row(h)
+
+        if list(self.tree.get_children()) != order:
+            for index, iid in enumerate(order):
+                self.tree.move(iid, "", index)
+
+        self.restripe()
+        self.update_plant_image()
 
+    def upsert_row(self, h):
+        iid = str(h.habit_id)
+        text = h.name
+        today = "✅" if h.goal_met_today else f"{h.today_completions}/{h.daily_goal}"
+        values = (f"{h.xp}", h.stage, f"{self.streaks[h.habit_id]} days", today)
+
+        cached = self.rows.get(iid)
+        if cached is None:
+            self.tree.insert("", tk.END, iid=iid, text=text, values=values)
+            self.rows[iid] = (text, values, None)
+        elif cached[:2] != (text, values):
+            self.tree.item(iid, text=text, values=values)
+            self.rows[iid] = (text, values, cached[2])
+
+    def remove_rows(self, iids):
+        if not iids:
+            return
+        self.tree.delete(*iids)
+        for iid in iids:
+            self.rows.pop(iid, None)
+
+    def restripe(self):
+        for i, iid in enumerate(self.tree.get_children()):
             tag = "even" if i % 2 == 0 else "odd"
+            name, values, current_tag = self.rows[iid]
+            if tag != current_tag:
+                self.tree.item(iid, tags=(tag,))
+                self.rows[iid] = (name, values, tag)
+
+    def refresh_habit(self, habit_id):
+        self.worker.submit(self.fetch_habit, self.outbox, habit_id,
+                           on_success=lambda habit: self.apply_habit(habit_id, habit),
+                           key=f"refresh:{habit_id}")
+
+    @staticmethod
+    def fetch_habit(outbox, habit_id):
+        habit = Habit.get(habit_id)
+        habits = outbox.apply_pending([habit] if habit else [], include_added=False)
+        return habits[0] if habits else None
+
+    def apply_habit(self, habit_id, habit):
+        if habit is None:
+            self.remove_habit(habit_id)
+            return
 
-            self.tree.insert("", tk.END, iid=h.habit_id, text=h.name,
-                             values=(f"{h.xp}", stage, f"{streak} days"), tags=(tag,))
+        # Where a new habit lands in a sorted, windowed list is the server's call
+        if self.paged and str(habit_id) not in self.rows:
+            self.load_habits()
+            return
 
-        self.tree.tag_configure("odd", background=COLORS["bg_frame"])
-        self.tree.tag_configure("even", background=COLORS["white"])
+        self.streaks[habit.habit_id] = habit.get_streak()
+        position = self.index.position.get(str(habit_id))
+        if position is None:
+            self.habits.append(habit)
+        else:
+            self.habits[position] = habit
+        self.index.upsert(habit)
+
+        # The change may move the habit in or out of the current filter
+        if self.filtering() and not self.paged:
+            self.render(self.visible_habits())
+            return
+
+        self.upsert_row(habit)
+        self.restripe()
+        self.update_plant_image()
 
+    def remove_habit(self, habit_id):
+        iid = str(habit_id)
+        habit = self.index.get(iid)
+        if habit is not None:
+            self.streaks.pop(habit.habit_id, None)
+            self.index.remove(iid)
+            self.habits = self.index.habits()
+
+        if iid in self.rows:
+            self.remove_rows([iid])
+        self.restripe()
         self.update_plant_image()
 
+    # --- Outbox sync ---
+    def queue_write(self, fn, *args):
+        # Record a write in the local outbox; only a local disk failure stops it
+        try:
+            result = fn(*args)
+        except Exception as e:
+            messagebox.showerror("Save Error", f"Could not save the change locally:\n{e}", parent=self.root)
+            return None
+        self.schedule_sync()
+        return result if result is not None else True
+
+    def schedule_sync(self, delay_ms=0):
+        if self.syncing:
+            self.sync_again = True
+            return
+        if self.sync_job is not None:
+            self.root.after_cancel(self.sync_job)
+        self.sync_job = self.root.after(delay_ms, self.sync)
+        self.update_sync_status()
+
+    def sync(self):
+        self.sync_job = None
+        # Until the schema is known to be current, writes wait; on_database_ready syncs them
+        if self.changes is None or not self.outbox.status()["pending"]:
+            self.update_sync_status()
+            return
+
+        self.syncing = True
+        self.worker.submit(self.outbox.flush, on_success=self.on_synced, on_error=self.on_sync_failed,
+                           key="sync", action="sync")
+
+    def on_synced(self, applied):
+        self.syncing = False
+        self.sync_delay = SYNC_RETRY_MS
+
+        for kind, queued_id, habit_id in applied:
+            if kind == "add":
+                self.remove_habit(queued_id)
+                self.refresh_habit(habit_id)
+            elif kind == "log":
+                self.refresh_habit(habit_id)
+
+        if self.sync_again or self.outbox.status()["pending"]:
+            self.sync_again = False
+            self.schedule_sync()
+        else:
+            self.update_sync_status()
+
+    def on_sync_failed(self, error):
+        # Stay offline and retry later; the writes are safe in the outbox
+        self.syncing = False
+        self.sync_again = False
+        print(f"Sync failed: {error}")
+        self.schedule_sync(self.sync_delay)
+        self.sync_delay = min(self.sync_delay * 2, SYNC_RETRY_MAX_MS)
+
+    # --- Changes from other clients ---
+    def poll_changes(self):
+        self.worker.submit(self.fetch_changes, self.changes, self.outbox, on_success=self.on_changes,
+                           on_error=self.on_poll_failed, key="changes", action="poll_changes", quiet=True)
+
+    @staticmethod
+    def fetch_changes(changes, outbox):
+        # Runs on the worker: {habit_id: Habit or None if deleted}, or None to reload everything
+        changed = changes.poll()
+        if changed is None:
+            analytics.invalidate()
+            return None
+        if not changed:
+            return {}
+
+        for habit_id in changed:
+            analytics.invalidate(habit_id)
+        found = Habit.get_many(changed)
+        habits = outbox.apply_pending(list(found.values()), include_added=False)
+        by_id = {h.habit_id: h for h in habits}
+        return {habit_id: by_id.get(habit_id) for habit_id in changed}
+
+    def on_changes(self, changed):
+        self.poll_delay = CHANGE_POLL_MS
+        self.root.after(self.poll_delay, self.poll_changes)
+
+        if changed is None:
+            self.load_habits()
+            return
+
+        windows = [w for w in self.detail_windows if w.winfo_exists()]
+        self.detail_windows = windows
+        for habit_id, habit in changed.items():
+            # A paged list only follows the rows it holds; new habits show up on the next reload
+            if habit is None or not self.paged or str(habit_id) in self.rows:
+                self.apply_habit(habit_id, habit)
+
+            for window in windows:
+                if window.habit.habit_id == habit_id:
+                    window.refresh(habit)
+
+    def on_poll_failed(self, error):
+        # Offline: try again less often, quietly; the outbox sync reports the outage
+        self.poll_delay = min(self.poll_delay * 2, SYNC_RETRY_MAX_MS)
+        self.root.after(self.poll_delay, self.poll_changes)
+
+    def update_sync_status(self):
+        status = self.outbox.status()
+        pending = status["pending"]
+        if not pending and self.database_error:
+            text, color = "⚠️ Offline: can't reach the habit database, retrying", COLORS["danger"]
+        elif not pending:
+            text, color = "☁️ All changes saved", COLORS["text"]
+        elif status["last_error"] or self.database_error:
+            text, color = f"⚠️ Offline: {pending} change(s) waiting to sync", COLORS["danger"]
+        else:
+            text, color = f"🔄 {pending} change(s) waiting to sync", COLORS["secondary"]
+        if status["failed"]:
+            text += f" · {status['failed']} could not be saved"
+            color = COLORS["danger"]
+        self.sync_label.config(text=text, fg=color)
+
+    def close(self):
+        self.stop_compaction.set()
+        self.worker.shutdown()
+        self.root.destroy()
+
+    def show_loading(self, busy):
+        self.loading_label.config(text="⏳ Syncing with the garden..." if busy else "")
+        self.root.config(cursor="watch" if busy else "")
+
+    def open_debug_window(self, event=None):
+        from .debug_window import DebugWindow
+        DebugWindow(self.root)
+
+    def open_export_window(self):
+        from .export_window import ExportWindow
+        ExportWindow(self.root)
+
     def add_habit(self):
-        AddHabitWindow(self.root, self.load_habits)
+        from .add_habit_window import AddHabitWindow
+        AddHabitWindow(self.root, self.create_habit)
+
+    def create_habit(self, name, daily_goal):
+        habit = self.queue_write(self.outbox.add, name, daily_goal)
+        if habit and not self.paged:
+            self.apply_habit(habit.habit_id, habit)
+        return habit
 
     def open_habit_detail(self, event):
         selected = self.tree.selection()
         if not selected: return
         habit_id = selected[0]
-        habit_obj = next((h for h in self.habits if str(h.habit_id) == str(habit_id)), None)
+        habit_obj = self.index.get(habit_id)
         if habit_obj:
-            HabitDetailWindow(self.root, habit_obj)
+            from .habit_detail_window import HabitDetailWindow
+            self.detail_windows.append(HabitDetailWindow(self.root, habit_obj, self.worker))
 
     def delete_habit(self):
         selected = self.tree.selection()
         if selected:
             confirm = messagebox.askyesno("Delete", "Are you sure you want to delete this habit?", parent=self.root)
             if confirm:
-                Habit.delete(selected[0])
-                self.load_habits()
+                habit_id = selected[0]
+                if self.queue_write(self.outbox.delete, habit_id):
+                    self.remove_habit(habit_id)
         else:
             messagebox.showwarning("Select", "Please select a habit to delete.", parent=self.root)
 
@@ -211,26 +793,41 @@ class MainWindow:
             return
 
         habit_id = selected[0]
-        habit_obj = next((h for h in self.habits if str(h.habit_id) == str(habit_id)), None)
+        habit_obj = self.index.get(habit_id)
 
-        if habit_obj:
-            logged_successfully = habit_obj.log_today()
-
-            if logged_successfully:
-                messagebox.showinfo("Habit Completed! 🎉",
-                                    f"You completed '{habit_obj.name}' today! Keep up the good work!",
-                                    parent=self.root)
+        if not habit_obj:
+            return
 
-                self.show_xp_feedback()
-                self.load_habits()
-            else:
-                messagebox.showwarning("Already Completed",
-                                       f"You have already completed '{habit_obj.name}' for today. Come back tomorrow!",
-                                       parent=self.root)
+        # Queue the completion and show its effect right away; the sync confirms it
+        if habit_obj.goal_met_today:
+            self.on_habit_completed(habit_obj, None)
+        elif self.queue_write(self.outbox.log, habit_obj.habit_id):
+            habit_obj.apply_completion()
+            self.on_habit_completed(habit_obj, (habit_obj.xp, habit_obj.get_streak()))
+
+    def on_habit_completed(self, habit_obj, result):
+        # result is the new (xp, streak), already applied to habit_obj, or None if the goal was met
+        if result and not habit_obj.goal_met_today:
+            messagebox.showinfo("Keep Going! 🌱",
+                                f"'{habit_obj.name}': {habit_obj.today_completions} of "
+                                f"{habit_obj.daily_goal} done today.",
+                                parent=self.root)
+            self.apply_habit(habit_obj.habit_id, habit_obj)
+        elif result:
+            messagebox.showinfo("Habit Completed! 🎉",
+                                f"You completed '{habit_obj.name}' today! Keep up the good work!",
+                                parent=self.root)
+
+            self.show_xp_feedback(self.progression.xp_for_completion(habit_obj.daily_goal))
+            self.apply_habit(habit_obj.habit_id, habit_obj)
+        else:
+            messagebox.showwarning("Already Completed",
+                                   f"You have already completed '{habit_obj.name}' for today. Come back tomorrow!",
+                                   parent=self.root)
 
-    def show_xp_feedback(self):
+    def show_xp_feedback(self, xp):
         xp_feedback_label = tk.Label(self.root,
-                                     text="+50 XP! 🎉",
+                                     text=f"+{xp} XP! 🎉",
                                      font=("Arial", 30, "bold"),
                                      bg=COLORS["bg_main"],
                                      fg=COLORS["primary"])
@@ -243,17 +840,18 @@ class MainWindow:
         habit_obj = None
 
         if selected:
-            habit_id = selected[0]
-            habit_obj = next((h for h in self.habits if str(h.habit_id) == str(habit_id)), None)
-        elif self.habits:
-            habit_obj = self.habits[0]
+            habit_obj = self.index.get(selected[0])
+        else:
+            first = self.tree.get_children()[:1]
+            habit_obj = self.index.get(first[0]) if first else None
 
         if habit_obj:
-            img = self.get_stage_image(habit_obj.xp)
-            if img:
-                self.image_label.config(image=img)
+            img = self.get_stage_image(habit_obj.stage)
+            if img or self.images_pending:
+                # While images are still streaming in, on_image_decoded() draws it later
+                self.image_label.config(image=img or "")
                 self.image_label.image = img
-                self.status_label.config(text=f"{habit_obj.name}: {self.get_stage(habit_obj.xp)}")
+                self.status_label.config(text=f"{habit_obj.name}: {habit_obj.stage}")
             else:
                 self.image_label.config(image="")
                 self.status_label.config(text=f"{habit_obj.name}: (Image missing)")
@@ -261,35 +859,6 @@ class MainWindow:
             self.image_label.config(image="")
             self.status_label.config(text="Welcome! Add a habit to start.")
 
-    def get_stage(self, xp):
-        if xp >= 500:
-            return "Tree"
-        elif xp >= 400:
-            return "Blooming"
-        elif xp >= 300:
-            return "Budding"
-        elif xp >= 200:
-            return "Small Plant"
-        elif xp >= 100:
-            return "Sprout"
-        else:
-            return "Seed"
-
-    def get_stage_image(self, xp):
-        stage = self.get_stage(xp)
-        file_map = {
-            "Seed": "seed.png",
-            "Sprout": "sprout.png",
-            "Small Plant": "small_plant.png",
-            "Budding": "budding.png",
-            "Blooming": "blooming.png",
-            "Tree": "tree.png"
-        }
-        path = os.path.join("assets", file_map[stage])
-        if os.path.exists(path):
-            try:
-                img = Image.open(path).resize((200, 200), Image.LANCZOS)
-                return ImageTk.PhotoImage(img)
-            except Exception:
-                return None
-        return None
\ No newline at end of file
+    def get_stage_image(self, stage):
+        # Don't decode on the Tk thread while the startup images are on their way
+        return self.images.stage_image(stage, load=not self.images_pending)
\ No newline at end of file